@@ -0,0 +1,144 @@
+from datetime import timezone
+
+import numpy as np
+from sgp4.api import SGP4_ERRORS, Satrec, SatrecArray, jday
+from skyfield.sgp4lib import theta_GMST1982
+
+from app.utils.ephemeris_cache import ephemeris_cache, ephemeris_key
+
+# Objetos propagados por cada llamada a SatrecArray (acota la memoria de r/v temporales)
+CATALOG_CHUNK = 2000
+
+# Código propio para TLEs que ni siquiera se pueden leer (los de sgp4 van de 1 a 6)
+TLE_PARSE_ERROR = -1
+
+WGS84_RADIUS_KM = 6378.137
+WGS84_E2 = (2 - 1 / 298.257223563) / 298.257223563
+
+
+def build_satrecs(tle_pairs):
+    """Construye un Satrec de sgp4 por cada par (tle_line1, tle_line2); None si el TLE no es válido."""
+    satrecs = []
+    for tle1, tle2 in tle_pairs:
+        try:
+            satrecs.append(Satrec.twoline2rv(tle1, tle2))
+        except Exception as e:
+            print(f"Error parsing TLE: {e}")
+            satrecs.append(None)
+    return satrecs
+
+
+def julian_dates(times):
+    """Convierte una lista de datetimes a los arrays (jd, fr) que espera sgp4."""
+    start = times[0].astimezone(timezone.utc)
+    jd0, fr0 = jday(
+        start.year, start.month, start.day, start.hour, start.minute, start.second + start.microsecond / 1e6
+    )
+    offsets = np.array([(t - times[0]).total_seconds() for t in times]) / 86400.0
+    return np.full(len(times), jd0), fr0 + offsets
+
+
+def compile_catalog(tle_pairs):
+    """
+    Prepara el catálogo para propagarlo muchas veces: un SatrecArray por bloque de CATALOG_CHUNK
+    objetos válidos. Devuelve (bloques [(filas, SatrecArray)], errores de lectura {fila: (código, mensaje)}).
+    """
+    satrecs = build_satrecs(tle_pairs)
+    errors = {row: (TLE_PARSE_ERROR, "invalid TLE") for row, satrec in enumerate(satrecs) if satrec is None}
+    valid = [row for row, satrec in enumerate(satrecs) if satrec is not None]
+    chunks = []
+    for c0 in range(0, len(valid), CATALOG_CHUNK):
+        rows = valid[c0 : c0 + CATALOG_CHUNK]
+        chunks.append((rows, SatrecArray([satrecs[row] for row in rows])))
+    return chunks, errors
+
+
+def propagate_catalog(tle_pairs, times, out=None, with_velocity=False, compiled=None):
+    """
+    Propaga todo el catálogo sobre los instantes `times` con SatrecArray (una llamada vectorizada en C
+    por bloque de CATALOG_CHUNK objetos). Devuelve (r, v, errores):
+      r: (N, T, 3) posiciones TEME en km (o `out` si se pasa); NaN donde sgp4 falla.
+      v: (N, T, 3) velocidades TEME en km/s si with_velocity, si no None.
+      errores: dict {fila: (código, mensaje)} de los objetos que fallan en algún instante
+               (p. ej. decaídos), para saltarlos sin tumbar el lote.
+    `compiled` es el resultado de compile_catalog(tle_pairs), para no reconstruir los Satrec en cada llamada.
+    """
+    jd, fr = julian_dates(times)
+    n, steps = len(tle_pairs), len(times)
+    r = out if out is not None else np.empty((n, steps, 3))
+    r.fill(np.nan)
+    v = np.full((n, steps, 3), np.nan) if with_velocity else None
+
+    chunks, parse_errors = compiled if compiled is not None else compile_catalog(tle_pairs)
+    errors = dict(parse_errors)
+    for rows, satrec_array in chunks:
+        codes, r_chunk, v_chunk = satrec_array.sgp4(jd, fr)
+        failed = codes != 0
+        r_chunk[failed] = np.nan
+        r[rows] = r_chunk
+        if with_velocity:
+            v_chunk[failed] = np.nan
+            v[rows] = v_chunk
+        for local in np.flatnonzero(failed.any(axis=1)):
+            code = int(codes[local][failed[local]][0])
+            errors[rows[local]] = (code, SGP4_ERRORS.get(code, "unknown error"))
+    return r, v, errors
+
+
+def teme_to_geodetic(r_teme, skyfield_times):
+    """
+    Convierte posiciones TEME (N, T, 3) a latitud/longitud geodésicas WGS84 (grados) y altitud (km),
+    rotando por el GMST de cada instante igual que hace Skyfield con EarthSatellite.
+    """
+    theta, _ = theta_GMST1982(skyfield_times.whole, skyfield_times.ut1_fraction)
+    cos_t, sin_t = np.cos(theta), np.sin(theta)
+    x = cos_t * r_teme[..., 0] + sin_t * r_teme[..., 1]
+    y = -sin_t * r_teme[..., 0] + cos_t * r_teme[..., 1]
+    z = r_teme[..., 2]
+
+    radius = np.hypot(x, y)
+    lat = np.arctan2(z, radius)
+    for _ in range(3):
+        sin_lat = np.sin(lat)
+        curvature = WGS84_RADIUS_KM / np.sqrt(1.0 - WGS84_E2 * sin_lat * sin_lat)
+        hyp = z + curvature * WGS84_E2 * sin_lat
+        lat = np.arctan2(hyp, radius)
+    lon = (np.arctan2(y, x) - np.pi) % (2 * np.pi) - np.pi
+    alt = np.sqrt(hyp * hyp + radius * radius) - curvature
+    return np.degrees(lat), np.degrees(lon), alt
+
+
+def propagate_positions(tle_pairs, times, interval_minutes, out=None, persist=True):
+    """
+    Igual que propagate_catalog (solo posiciones) pero leyendo y guardando cada fila en la caché de
+    efemérides; solo los objetos sin entrada se propagan, en lotes de CATALOG_CHUNK.
+    Con persist=False las filas nuevas solo se guardan en memoria (sin escribir los .npy).
+    Devuelve (r, errores). Las filas con error no se cachean.
+    """
+    steps = len(times)
+    r = out if out is not None else np.empty((len(tle_pairs), steps, 3))
+    keys = []
+    missing = []
+    for row, (tle1, tle2) in enumerate(tle_pairs):
+        try:
+            key = ephemeris_key("teme", tle1, tle2, times[0], interval_minutes, steps)
+        except (TypeError, ValueError):
+            key = None
+        keys.append(key)
+        cached = ephemeris_cache.get(key) if key else None
+        if cached is None:
+            missing.append(row)
+        else:
+            r[row] = cached
+
+    errors = {}
+    for c0 in range(0, len(missing), CATALOG_CHUNK):
+        rows = missing[c0 : c0 + CATALOG_CHUNK]
+        r_chunk, _, chunk_errors = propagate_catalog([tle_pairs[row] for row in rows], times)
+        r[rows] = r_chunk
+        for local, row in enumerate(rows):
+            if local in chunk_errors:
+                errors[row] = chunk_errors[local]
+            elif keys[row]:
+                ephemeris_cache.put(keys[row], r_chunk[local], persist=persist)
+    return r, errors
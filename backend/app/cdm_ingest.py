@@ -0,0 +1,197 @@
+# app/cdm_ingest.py
+"""
+Ingesta masiva de CDMs desde CSV (exportaciones tipo cdm_data_YYYYMMDD_HHMMSS.csv).
+
+El fichero se lee en streaming por bloques de CDM_CHUNK_ROWS filas y cada bloque se inserta con un
+único INSERT ... ON CONFLICT (id) DO NOTHING RETURNING id, de modo que los CDMs repetidos se descartan
+en la base de datos y solo los nuevos se encolan para la evaluación de alertas (utils/alert_queue).
+Los CDMs sin PC reciben antes de insertarse el Pc máximo estimado (utils/collision_probability).
+
+Uso: python -m app.cdm_ingest cdm_data.csv [cdm_data_2.csv.gz ...]
+"""
+import argparse
+import csv
+import gzip
+import io
+import time
+from datetime import datetime
+
+from app.database import SessionLocal
+from app.models import CDM
+from app.utils.alert_queue import alert_queue
+from app.utils.collision_probability import fill_missing_pc
+from app.utils.stats_cache import stats_cache
+
+# Filas por bloque (una transacción y un INSERT multi-fila por bloque)
+CDM_CHUNK_ROWS = 5000
+
+
+def _float_or_none(value):
+    value = value.strip()
+    return float(value) if value else None
+
+
+def _str_or_none(value):
+    value = value.strip()
+    return value or None
+
+
+def _datetime(value):
+    return datetime.fromisoformat(value.strip())
+
+
+def _min_rng_km(value):
+    # El CSV trae MIN_RNG en metros; la tabla guarda km
+    value = _float_or_none(value)
+    return value / 1000.0 if value is not None else None
+
+
+# Columna del CSV -> (campo del modelo, conversión)
+CDM_CSV_COLUMNS = {
+    "CDM_ID": ("id", str.strip),
+    "CREATED": ("created", _datetime),
+    "EMERGENCY_REPORTABLE": ("emergency_reportable", str.strip),
+    "TCA": ("tca", _datetime),
+    "MIN_RNG": ("min_rng", _min_rng_km),
+    "PC": ("pc", _float_or_none),
+    "SAT_1_ID": ("sat_1_id", str.strip),
+    "SAT_1_NAME": ("sat_1_name", str.strip),
+    "SAT1_OBJECT_TYPE": ("sat1_object_type", _str_or_none),
+    "SAT1_RCS": ("sat1_rcs", _str_or_none),
+    "SAT_1_EXCL_VOL": ("sat_1_excl_vol", _float_or_none),
+    "SAT_2_ID": ("sat_2_id", str.strip),
+    "SAT_2_NAME": ("sat_2_name", str.strip),
+    "SAT2_OBJECT_TYPE": ("sat2_object_type", _str_or_none),
+    "SAT2_RCS": ("sat2_rcs", _str_or_none),
+    "SAT_2_EXCL_VOL": ("sat_2_excl_vol", _float_or_none),
+}
+
+
+def iter_cdm_chunks(lines, chunk_rows=CDM_CHUNK_ROWS, errors=None):
+    """
+    Lee un CSV de CDMs línea a línea y produce listas de hasta chunk_rows filas (dicts del modelo).
+    Las filas que no se pueden convertir se cuentan en errors["rows"] y se descartan.
+    """
+    errors = errors if errors is not None else {}
+    reader = csv.reader(lines)
+    header = [name.strip().upper() for name in next(reader, [])]
+    missing = [name for name in CDM_CSV_COLUMNS if name not in header]
+    if missing:
+        raise ValueError(f"CSV sin columnas requeridas: {', '.join(missing)}")
+    columns = [(header.index(name), field, convert) for name, (field, convert) in CDM_CSV_COLUMNS.items()]
+
+    chunk = []
+    for line_no, record in enumerate(reader, start=2):
+        if not record:
+            continue
+        try:
+            chunk.append({field: convert(record[idx]) for idx, field, convert in columns})
+        except (ValueError, IndexError) as e:
+            errors["rows"] = errors.get("rows", 0) + 1
+            if errors["rows"] <= 10:
+                print(f"Error parsing CDM at line {line_no}: {e}")
+            continue
+        if len(chunk) >= chunk_rows:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _insert_ignore_statement(db):
+    """INSERT ... ON CONFLICT (id) DO NOTHING RETURNING id del dialecto en uso (PostgreSQL o SQLite)."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"Bulk CDM insert not supported for dialect {dialect}")
+    # Sobre la tabla (Core) y no sobre la entidad: evita el camino de bulk insert del ORM, mucho más lento
+    table = CDM.__table__
+    return insert(table).on_conflict_do_nothing(index_elements=[table.c.id]).returning(table.c.id)
+
+
+def ingest_cdm_lines(lines, chunk_rows=CDM_CHUNK_ROWS, evaluate_alerts=True):
+    """
+    Ingesta un CSV de CDMs ya abierto como texto. Cada bloque se inserta y confirma por separado y
+    los IDs realmente insertados se encolan para evaluar alertas (la cola llena frena la ingesta).
+    Devuelve las estadísticas de la ingesta (filas leídas, insertadas, duplicadas, errores, filas/s).
+    """
+    started = time.perf_counter()
+    errors = {}
+    stats = {"rows_read": 0, "inserted": 0, "duplicates": 0, "pc_estimated": 0, "alerts_queued": 0}
+    db = SessionLocal()
+    try:
+        stmt = _insert_ignore_statement(db)
+        for chunk in iter_cdm_chunks(lines, chunk_rows, errors):
+            ingested_at = datetime.utcnow()
+            for row in chunk:
+                row["ingested_at"] = ingested_at
+                row.setdefault("pc_method", None)
+            stats["pc_estimated"] += fill_missing_pc(chunk)
+            new_ids = db.execute(stmt, chunk).scalars().all()
+            db.commit()
+            if new_ids:
+                stats_cache.invalidate()
+            if evaluate_alerts and alert_queue.submit(new_ids):
+                stats["alerts_queued"] += len(new_ids)
+            stats["rows_read"] += len(chunk)
+            stats["inserted"] += len(new_ids)
+            stats["duplicates"] += len(chunk) - len(new_ids)
+    finally:
+        db.close()
+
+    elapsed = time.perf_counter() - started
+    stats["errors"] = errors.get("rows", 0)
+    stats["seconds"] = round(elapsed, 3)
+    stats["rows_per_s"] = round(stats["rows_read"] / elapsed, 1) if elapsed > 0 else None
+    print(
+        f"✅ CDM ingest: {stats['rows_read']} rows read, {stats['inserted']} inserted, "
+        f"{stats['duplicates']} duplicates, {stats['errors']} errors, {stats['pc_estimated']} PC estimated, "
+        f"{stats['alerts_queued']} queued for alerts "
+        f"in {elapsed:.2f}s ({stats['rows_per_s']} rows/s)."
+    )
+    return stats
+
+
+def ingest_cdm_binary(stream, gzipped=False, **kwargs):
+    """Ingesta desde un flujo binario (fichero o cuerpo de la petición), opcionalmente comprimido con gzip."""
+    if gzipped:
+        stream = gzip.GzipFile(fileobj=stream, mode="rb")
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    try:
+        return ingest_cdm_lines(text, **kwargs)
+    finally:
+        text.detach()
+
+
+def ingest_cdm_file(path, **kwargs):
+    """Ingesta un fichero CSV (o .csv.gz) sin cargarlo entero en memoria."""
+    with open(path, "rb") as f:
+        return ingest_cdm_binary(f, gzipped=path.endswith(".gz"), **kwargs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingesta masiva de CDMs desde ficheros CSV")
+    parser.add_argument("paths", nargs="+", help="Ficheros CSV (o .csv.gz) de CDMs")
+    parser.add_argument("--chunk-rows", type=int, default=CDM_CHUNK_ROWS, help="Filas por bloque de inserción")
+    parser.add_argument("--no-alerts", action="store_true", help="No evaluar alertas para los CDMs nuevos")
+    args = parser.parse_args()
+
+    from app import models
+    from app.database import engine
+    from app.utils.schema_sync import sync_schema
+
+    sync_schema(engine, models.Base.metadata)
+    for path in args.paths:
+        print(f"📥 Ingesting CDMs from {path}...")
+        ingest_cdm_file(path, chunk_rows=args.chunk_rows, evaluate_alerts=not args.no_alerts)
+    # El proceso de la CLI no sigue vivo: se espera a que el worker termine las alertas encoladas
+    alert_queue.stop()
+    stats = alert_queue.get_stats()
+    print(f"🚨 {stats['alerts_created']} alerts created from {stats['processed_ids']} new CDMs.")
+
+
+if __name__ == "__main__":
+    main()
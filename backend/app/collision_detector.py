@@ -1,16 +1,46 @@
+import math
 from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 
 import numpy as np
+from sgp4.api import jday
 from skyfield.api import EarthSatellite, load
 
+from app.catalog_propagator import build_satrecs
+from app.utils.ephemeris_cache import align_start, ephemeris_cache, ephemeris_key
+from app.utils.spatial_hash import default_screening_km
+
+# Máximo de elementos (par, paso) evaluados por bloque al comparar distancias.
+# Con float64 y 3 componentes equivale a ~24 MB de memoria temporal.
+DEFAULT_BLOCK_ELEMENTS = 1_000_000
+
+
+@lru_cache(maxsize=1)
+def get_timescale():
+    """Timescale de Skyfield, cargado la primera vez que se necesita (no al importar) y reutilizado."""
+    return load.timescale()
 
-def extract_position_series(tle1, tle2, name, duration_hours=24, interval_minutes=10, start_time=None):
-    ts = load.timescale()
-    satellite = EarthSatellite(tle1, tle2, name, ts)
+
+def grid_steps(duration_hours, interval_minutes):
+    """
+    Muestras de la rejilla: incluye la del final de la ventana para que los encuentros del último
+    intervalo también queden entre dos muestras (si la duración no es múltiplo del paso, se redondea hacia arriba).
+    """
+    return math.ceil(duration_hours * 60 / interval_minutes - 1e-9) + 1
+
+
+def build_time_grid(start_time=None, duration_hours=24, interval_minutes=10, align=False):
+    """
+    Genera la rejilla temporal compartida (datetimes y tiempos de Skyfield), de 0 a duration_hours incluidos.
+    Con align=True el inicio se redondea al intervalo para reutilizar efemérides cacheadas.
+    """
+    ts = get_timescale()
 
     if start_time is None:
         start_time = datetime.now(timezone.utc)
-    steps = int((duration_hours * 60) / interval_minutes)
+    if align:
+        start_time = align_start(start_time, interval_minutes)
+    steps = grid_steps(duration_hours, interval_minutes)
     times = [start_time + timedelta(minutes=i * interval_minutes) for i in range(steps)]
 
     skyfield_times = ts.utc(
@@ -19,28 +49,184 @@ def extract_position_series(tle1, tle2, name, duration_hours=24, interval_minute
         [t.day for t in times],
         [t.hour for t in times],
         [t.minute for t in times],
-        [t.second for t in times],
+        [t.second + t.microsecond / 1e6 for t in times],
+    )
+    return times, skyfield_times
+
+
+def extract_position_series(tle1, tle2, name, duration_hours=24, interval_minutes=10, start_time=None):
+    ts = get_timescale()
+
+    times, skyfield_times = build_time_grid(start_time, duration_hours, interval_minutes)
+
+    def _compute():
+        satellite = EarthSatellite(tle1, tle2, name, ts)
+        return satellite.at(skyfield_times).position.km.T  # shape: (steps, 3)
+
+    key = ephemeris_key("position", tle1, tle2, times[0], interval_minutes, len(times))
+    return times, ephemeris_cache.get_or_compute(key, _compute)
+
+
+def propagate_teme(satrecs, rows, jd, fr):
+    """
+    Propaga con sgp4 el objeto rows[k] en el instante (jd[k], fr[k]), agrupando por objeto.
+    Devuelve posiciones (km) y velocidades (km/s) TEME de forma (len(rows), 3); NaN si hay error.
+    """
+    rows = np.asarray(rows, dtype=np.intp)
+    r = np.full((len(rows), 3), np.nan)
+    v = np.full((len(rows), 3), np.nan)
+    order = np.argsort(rows, kind="stable")
+    unique_rows, first = np.unique(rows[order], return_index=True)
+    for row, idx in zip(unique_rows, np.split(order, first[1:])):
+        satrec = satrecs[row]
+        if satrec is None:
+            continue
+        errors, r_obj, v_obj = satrec.sgp4_array(jd[idx], fr[idx])
+        ok = errors == 0
+        r[idx[ok]] = r_obj[ok]
+        v[idx[ok]] = v_obj[ok]
+    return r, v
+
+
+def find_encounters(
+    positions,
+    start_time,
+    interval_minutes,
+    satrecs,
+    rows_a,
+    rows_b,
+    threshold_km=5.0,
+    window_km=None,
+    dense_points=21,
+    newton_iterations=5,
+    max_block_elements=DEFAULT_BLOCK_ELEMENTS,
+):
+    """
+    Búsqueda del tiempo de máximo acercamiento (TCA) de grueso a fino para pares candidatos.
+    1. Busca mínimos locales de distancia en la rejilla gruesa que queden por debajo de window_km.
+    2. Bisección de la ventana de +/- un intervalo alrededor de cada mínimo, propagando solo los puntos
+       medios y descartando en cada nivel las ventanas que ya no pueden bajar de threshold_km.
+    3. Refina con Newton sobre la velocidad de acercamiento (r·v = 0).
+    Devuelve (filas_a, filas_b, tca_minutos, distancia_km, velocidad_relativa_km_s), un registro por encuentro
+    con distancia menor que threshold_km; tca_minutos es relativo a start_time.
+    """
+    rows_a = np.asarray(rows_a, dtype=np.intp)
+    rows_b = np.asarray(rows_b, dtype=np.intp)
+    steps = positions.shape[1]
+    if window_km is None:
+        window_km = default_screening_km(threshold_km, interval_minutes)
+    window_sq = window_km**2
+
+    # 1. Mínimos locales en la rejilla gruesa
+    pair_block = max(1, max_block_elements // max(steps, 1))
+    win_pairs, win_steps = [], []
+    for p0 in range(0, len(rows_a), pair_block):
+        diff = positions[rows_a[p0 : p0 + pair_block]] - positions[rows_b[p0 : p0 + pair_block]]
+        dist_sq = np.einsum("ptk,ptk->pt", diff, diff)
+        padded = np.pad(dist_sq, ((0, 0), (1, 1)), constant_values=np.inf)
+        minima = (dist_sq <= padded[:, :-2]) & (dist_sq < padded[:, 2:]) & (dist_sq < window_sq)
+        # Cota más ajustada con la muestra vecina: entre t_k y t_k±1 la distancia no baja de
+        # (d_k + d_k±1 - v·Δ) / 2, así que solo hay encuentro posible si d_k + d_k±1 < 2·window_km
+        neighbor_sq = np.minimum(padded[:, :-2], padded[:, 2:])
+        minima &= np.sqrt(dist_sq) + np.sqrt(neighbor_sq) < 2 * window_km
+        ip, it = np.nonzero(minima)
+        win_pairs.append(p0 + ip)
+        win_steps.append(it)
+
+    empty = np.empty(0, dtype=np.intp)
+    if not win_pairs or not sum(len(w) for w in win_pairs):
+        return empty, empty, np.empty(0), np.empty(0), np.empty(0)
+    win_pairs = np.concatenate(win_pairs)
+    win_steps = np.concatenate(win_steps)
+    pair_a, pair_b = rows_a[win_pairs], rows_b[win_pairs]
+
+    # 2. Bisección alrededor de cada mínimo: en cada nivel se propaga solo en los dos puntos medios, se
+    #    recentra en la muestra más cercana y se descartan las ventanas cuya cota ya supera el umbral
+    lo = np.maximum(win_steps - 1, 0) * float(interval_minutes)
+    hi = np.minimum(win_steps + 1, steps - 1) * float(interval_minutes)
+    jd0, fr0 = jday(
+        start_time.year, start_time.month, start_time.day,
+        start_time.hour, start_time.minute, start_time.second + start_time.microsecond / 1e6,
     )
 
-    positions = satellite.at(skyfield_times).position.km  # returns 3D array
-    return times, np.array(positions).T  # shape: (steps, 3)
+    def _relative_state(minutes, idx_a, idx_b):
+        flat = minutes.ravel()
+        jd = np.full(flat.shape, jd0)
+        fr = fr0 + flat / 1440.0
+        r_a, v_a = propagate_teme(satrecs, idx_a, jd, fr)
+        r_b, v_b = propagate_teme(satrecs, idx_b, jd, fr)
+        return r_a - r_b, v_a - v_b
+
+    def _coarse_distance(step_idx):
+        inside = (step_idx >= 0) & (step_idx < steps)
+        step_idx = np.clip(step_idx, 0, steps - 1)
+        dist = np.linalg.norm(positions[pair_a, step_idx] - positions[pair_b, step_idx], axis=1)
+        return np.where(inside & ~np.isnan(dist), dist, np.inf)
+
+    d_left, d_center, d_right = (_coarse_distance(win_steps + k) for k in (-1, 0, 1))
+    center = win_steps * float(interval_minutes)
+    half = float(interval_minutes)
+    # Separación final equivalente a dense_points muestras en la ventana de +/- un intervalo
+    min_half = 2.0 * interval_minutes / max(dense_points - 1, 1)
+    # Margen del volumen de cribado por minuto de separación entre muestras (medio paso a la velocidad máxima)
+    margin_per_minute = (window_km - threshold_km) / interval_minutes
+    while half > min_half and len(center):
+        half /= 2
+        probes = np.clip(np.stack([center - half, center + half], axis=1), lo[:, None], hi[:, None])
+        dr, _ = _relative_state(probes, np.repeat(pair_a, 2), np.repeat(pair_b, 2))
+        d_probe = np.linalg.norm(dr, axis=1).reshape(-1, 2)
+        d_probe = np.where(np.isnan(d_probe), np.inf, d_probe)
+        samples = np.stack([d_left, d_probe[:, 0], d_center, d_probe[:, 1], d_right], axis=1)
+        best = 1 + np.argmin(samples[:, 1:4], axis=1)
+        idx = np.arange(len(best))
+        # Mismo recorte que las sondas: en los bordes de la ventana el centro no puede salirse de [lo, hi]
+        center = np.clip(center + (best - 2) * half, lo, hi)
+        d_left, d_center, d_right = samples[idx, best - 1], samples[idx, best], samples[idx, best + 1]
+        keep = d_center + np.minimum(d_left, d_right) < 2 * (threshold_km + margin_per_minute * half)
+        pair_a, pair_b, lo, hi, center = pair_a[keep], pair_b[keep], lo[keep], hi[keep], center[keep]
+        d_left, d_center, d_right = d_left[keep], d_center[keep], d_right[keep]
+    tca = center
+
+    # 3. Newton sobre la tasa de cambio de la distancia
+    for _ in range(newton_iterations):
+        dr, dv = _relative_state(tca, pair_a, pair_b)
+        step_s = -np.einsum("nk,nk->n", dr, dv) / np.einsum("nk,nk->n", dv, dv)
+        tca = np.clip(tca + np.nan_to_num(step_s) / 60.0, lo, hi)
+
+    dr, dv = _relative_state(tca, pair_a, pair_b)
+    miss = np.linalg.norm(dr, axis=1)
+    speed = np.linalg.norm(dv, axis=1)
+    close = miss < threshold_km
+    return pair_a[close], pair_b[close], tca[close], miss[close], speed[close]
 
 
 def detect_close_approaches(
-    tle1_a, tle2_a, name_a, tle1_b, tle2_b, name_b, threshold_km=5.0
+    tle1_a, tle2_a, name_a, tle1_b, tle2_b, name_b, threshold_km=5.0, duration_hours=24, interval_minutes=10
 ):
     shared_start_time = datetime.now(timezone.utc)
-    times_a, pos_a = extract_position_series(tle1_a, tle2_a, name_a, start_time=shared_start_time)
-    times_b, pos_b = extract_position_series(tle1_b, tle2_b, name_b, start_time=shared_start_time)
+    times_a, pos_a = extract_position_series(
+        tle1_a, tle2_a, name_a, duration_hours, interval_minutes, start_time=shared_start_time
+    )
+    times_b, pos_b = extract_position_series(
+        tle1_b, tle2_b, name_b, duration_hours, interval_minutes, start_time=shared_start_time
+    )
 
     assert len(times_a) == len(times_b), "Time steps must match"
 
+    satrecs = build_satrecs([(tle1_a, tle2_a), (tle1_b, tle2_b)])
+    _, _, tca, miss, speed = find_encounters(
+        np.stack([pos_a, pos_b]), shared_start_time, interval_minutes, satrecs, [0], [1], threshold_km
+    )
+
     close_approaches = []
 
-    for i in range(len(times_a)):
-        dist = np.linalg.norm(pos_a[i] - pos_b[i])
+    for minutes, dist, rel_speed in zip(tca, miss, speed):
         close_approaches.append(
-            {"time": times_a[i].isoformat() + "Z", "distance_km": round(dist, 3)}
+            {
+                "time": (shared_start_time + timedelta(minutes=float(minutes))).isoformat(),
+                "distance_km": round(float(dist), 3),
+                "relative_velocity_km_s": round(float(rel_speed), 3),
+            }
         )
 
     return close_approaches
@@ -1,30 +1,47 @@
 from contextlib import asynccontextmanager
+from datetime import datetime
 
 from apscheduler.schedulers.background import BackgroundScheduler
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app import database, models
-from app.routes import collisions_scan, orbit, satellites, summary, cdm, collision_alerts
-from app.tle_fetcher import fetch_and_store_tles
+from app.routes import collisions_scan, orbit, satellites, summary, cdm, collision_alerts, positions
+from app.tle_fetcher import backfill_debris_origin, fetch_and_store_tles
+from app.utils.alert_queue import alert_queue
+from app.utils.collision_probability import backfill_cdm_pc
 from app.utils.collision_scheduler import scan_cdm_for_alerts
+from app.utils.name_search import setup_name_search
+from app.utils.schema_sync import sync_schema
 
-# 🔧 Create tables if they don't exist
-models.Base.metadata.create_all(bind=database.engine)
+# 🔧 Create tables if they don't exist and add new columns/indexes to existing ones
+sync_schema(database.engine, models.Base.metadata)
 
 # 🛰️ Setup scheduler
 scheduler = BackgroundScheduler()
 
 
+def run_startup_maintenance():
+    # Tareas únicas sobre todo el catálogo: corren en segundo plano para no retrasar el arranque.
+    # Mientras se crea el índice de nombres, la búsqueda usa ILIKE sin índice.
+    setup_name_search(database.engine)
+    backfill_debris_origin()
+    backfill_cdm_pc()
+
+
 def start_tle_scheduler():
-    # Avoid duplicate jobs on reload
+    # Avoid duplicate jobs on reload.
+    # The first TLE fetch runs right away in the background (respects 6-hour skip logic); the API serves
+    # the existing data meanwhile.
+    if not scheduler.get_job("startup-maintenance"):
+        scheduler.add_job(run_startup_maintenance, "date", id="startup-maintenance")
     if not scheduler.get_job("tle-fetch"):
-        scheduler.add_job(fetch_and_store_tles, "interval", hours=6, id="tle-fetch")
-        print("🔁 Scheduled TLE fetch every 6 hours.")
-    # Añadir tarea programada para escanear CDMs cada 8 horas
+        scheduler.add_job(fetch_and_store_tles, "interval", hours=6, id="tle-fetch", next_run_time=datetime.now())
+        print("🔁 Scheduled TLE fetch now and every 6 hours.")
+    # Las alertas se evalúan al ingestar (alert_queue); este barrido cada 8 horas solo reconcilia lo que se haya perdido
     if not scheduler.get_job("cdm-scan"):
         scheduler.add_job(scan_cdm_for_alerts, "interval", hours=8, id="cdm-scan")
-        print("🔁 Scheduled CDM scan every 8 hours.")
+        print("🔁 Scheduled CDM reconciliation scan every 8 hours.")
     scheduler.start()
 
 
@@ -33,17 +50,16 @@ def start_tle_scheduler():
 async def lifespan(app: FastAPI):
     print("🟢 App starting up...")
 
-    # Fetch TLEs on startup (respects 6-hour skip logic)
-    fetch_and_store_tles()
-
-    # Start 6-hour repeating TLE fetch job
+    # Start TLE fetch job (first run in the background), CDM reconciliation scan and alert worker
     start_tle_scheduler()
+    alert_queue.start()
 
     yield  # app runs after this
 
     # 🔻 Optional: Shutdown logic
     print("🛑 App shutting down...")
     scheduler.shutdown()
+    alert_queue.stop()
 
 
 # 🧠 Create FastAPI app
@@ -65,3 +81,4 @@ app.include_router(satellites.router, prefix="/api")
 app.include_router(summary.router, prefix="/api")
 app.include_router(cdm.router, prefix="/api")
 app.include_router(collision_alerts.router, prefix="/api")
+app.include_router(positions.router, prefix="/api")
@@ -1,7 +1,7 @@
 # app/models.py
 from datetime import datetime
 
-from sqlalchemy import Column, DateTime, Float, Integer, String, UniqueConstraint
+from sqlalchemy import Column, DateTime, Float, Index, Integer, String, UniqueConstraint, func
 
 from app.database import Base
 
@@ -15,10 +15,15 @@ class Satellite(Base):
     tle_line2 = Column(String)
     object_type = Column(String, nullable=True)  # e.g., 'PAYLOAD', 'DEBRIS', 'ROCKET BODY'
     source = Column(String, nullable=True)  # Optional: to track data source
-    created_at = Column(DateTime, default=datetime.now)
-    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+    origin = Column(String, nullable=True)  # Evento de origen del debris, e.g., 'cosmos_1408' ('other' si no se conoce)
+    created_at = Column(DateTime, default=datetime.now, index=True)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now, index=True)
 
-    __table_args__ = (UniqueConstraint("norad_id", name="uq_norad_id"),)
+    __table_args__ = (
+        UniqueConstraint("norad_id", name="uq_norad_id"),
+        Index("ix_satellites_name_lower", func.lower(name)),  # Autocompletado por prefijo
+        Index("ix_satellites_object_type_origin", object_type, origin),  # GROUP BY de /debris/stats
+    )
 
 
 class CollisionAlert(Base):
@@ -36,6 +41,14 @@ class CollisionAlert(Base):
     risk_level = Column(String, nullable=True)  # Ej: 'HIGH', 'MEDIUM', 'LOW'
     alert_reason = Column(String, nullable=True)  # Texto opcional
 
+    # Paginación por clave (tca/created, id) y filtros por objeto ordenados por TCA
+    __table_args__ = (
+        Index("ix_collision_alerts_tca_id", "tca", "id"),
+        Index("ix_collision_alerts_created_id", "created", "id"),
+        Index("ix_collision_alerts_sat_1_id_tca", "sat_1_id", "tca"),
+        Index("ix_collision_alerts_sat_2_id_tca", "sat_2_id", "tca"),
+    )
+
 
 class TLEMetadata(Base):
     __tablename__ = "tle_metadata"
@@ -43,6 +56,26 @@ class TLEMetadata(Base):
     last_fetched_at = Column(DateTime, default=datetime.now)
 
 
+class TLESourceState(Base):
+    __tablename__ = "tle_source_state"
+    id = Column(Integer, primary_key=True, index=True)
+    source = Column(String, unique=True, nullable=False)  # e.g., 'CelesTrak', 'cosmos-1408-debris'
+    url = Column(String, nullable=False)
+    etag = Column(String, nullable=True)
+    last_modified = Column(String, nullable=True)  # Cabecera HTTP tal cual la envía el servidor
+    last_checked_at = Column(DateTime, nullable=True)
+    last_changed_at = Column(DateTime, nullable=True)
+    row_count = Column(Integer, nullable=True)
+
+
+class AlertScanState(Base):
+    __tablename__ = "alert_scan_state"
+    id = Column(Integer, primary_key=True, index=True)
+    last_ingested_at = Column(DateTime, nullable=True)  # Mayor CDM.ingested_at ya evaluado
+    last_run_at = Column(DateTime, nullable=True)
+    last_alerts_created = Column(Integer, nullable=True)
+
+
 class CDM(Base):
     __tablename__ = "cdm"
     id = Column(String, primary_key=True, index=True)  # CDM_ID as string
@@ -51,6 +84,7 @@ class CDM(Base):
     tca = Column(DateTime, nullable=False)  # Time of Closest Approach
     min_rng = Column(Float, nullable=True)  # Minimum Range (km)
     pc = Column(Float, nullable=True)  # Probability of Collision
+    pc_method = Column(String, nullable=True)  # None = PC publicado en el CDM; 'max_pc' = estimado sin covarianza (no es una cota superior)
     sat_1_id = Column(String, nullable=False)
     sat_1_name = Column(String, nullable=False)
     sat1_object_type = Column(String, nullable=True)
@@ -61,6 +95,15 @@ class CDM(Base):
     sat2_object_type = Column(String, nullable=True)
     sat2_rcs = Column(String, nullable=True)
     sat_2_excl_vol = Column(Float, nullable=True)
+    ingested_at = Column(DateTime, nullable=True, index=True, default=datetime.utcnow)  # Marca de agua de alertas
+
+    # Paginación por clave (tca/created, id) y filtros por objeto ordenados por TCA
+    __table_args__ = (
+        Index("ix_cdm_tca_id", "tca", "id"),
+        Index("ix_cdm_created_id", "created", "id"),
+        Index("ix_cdm_sat_1_id_tca", "sat_1_id", "tca"),
+        Index("ix_cdm_sat_2_id_tca", "sat_2_id", "tca"),
+    )
 
     def __repr__(self):
         return f"<CDM id={self.id} TCA={self.tca} SAT_1={self.sat_1_name} SAT_2={self.sat_2_name}>"
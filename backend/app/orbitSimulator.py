@@ -1,40 +1,90 @@
-from datetime import datetime, timedelta, timezone
+from datetime import timedelta
+from functools import lru_cache
 
-from skyfield.api import EarthSatellite, load
+import numpy as np
+
+from app.catalog_propagator import propagate_catalog, propagate_positions, teme_to_geodetic
+from app.collision_detector import build_time_grid
+from app.utils.ephemeris_cache import ephemeris_cache, ephemeris_key
+
+
+@lru_cache(maxsize=64)
+def _grid_iso(start, step, steps):
+    # En microsegundos, como los datetime de la rejilla: con pasos no enteros (interval_minutes=1.3333)
+    # las etiquetas no se desvían; solo se muestran milisegundos si la rejilla los tiene
+    grid = np.datetime64(start.replace(tzinfo=None), "us") + np.timedelta64(step, "us") * np.arange(steps)
+    whole_seconds = start.microsecond == 0 and step % timedelta(seconds=1) == timedelta(0)
+    return tuple(t + "Z" for t in np.datetime_as_string(grid, unit="s" if whole_seconds else "ms").tolist())
+
+
+def orbit_times_iso(times):
+    """
+    Instantes de la rejilla (regular, UTC) como cadenas ISO 8601 terminadas en Z. Las rejillas están
+    alineadas al intervalo, así que las peticiones cercanas reutilizan las mismas cadenas.
+    """
+    if not times:
+        return []
+    step = times[1] - times[0] if len(times) > 1 else timedelta(0)
+    return list(_grid_iso(times[0], step, len(times)))
+
+
+def simulate_orbit_arrays(tle_line1, tle_line2, name, duration_hours=24, interval_minutes=10):
+    """Devuelve (times, subpoints): subpoints es un array (T, 3) con lat, lon (grados) y alt (km)."""
+    # Step 1: Generate time steps (aligned to the interval so cached ephemerides can be reused)
+    times, skyfield_times = build_time_grid(None, duration_hours, interval_minutes, align=True)
+
+    # Step 2: Read positions from the ephemeris cache or compute them with the batched SGP4 propagator
+    key = ephemeris_key("subpoint", tle_line1, tle_line2, times[0], interval_minutes, len(times))
+    subpoints = ephemeris_cache.get(key)
+    if subpoints is None:
+        r, _, errors = propagate_catalog([(tle_line1, tle_line2)], times)
+        lat, lon, alt = teme_to_geodetic(r, skyfield_times)
+        subpoints = np.stack([lat[0], lon[0], alt[0]], axis=1)
+        if errors:
+            print(f"Error propagating {name}: {errors[0][1]}")
+        else:
+            ephemeris_cache.put(key, subpoints)
+    return times, subpoints
+
+
+def orbit_columns(times, subpoints):
+    """Formato en columnas: listas paralelas time/lat/lon/alt, redondeadas de una vez sobre el array."""
+    return {
+        "time": orbit_times_iso(times),
+        "lat": np.round(subpoints[:, 0], 4).tolist(),
+        "lon": np.round(subpoints[:, 1], 4).tolist(),
+        "alt": np.round(subpoints[:, 2], 2).tolist(),
+    }
+
+
+def orbit_binary(subpoints):
+    """Formato binario: float32 little-endian, T filas de (lat, lon, alt)."""
+    return np.ascontiguousarray(subpoints, dtype="<f4").tobytes()
+
+
+def orbit_points(times, subpoints):
+    """Formato original: una lista de puntos {time, lat, lon, alt}, construida desde las columnas."""
+    columns = orbit_columns(times, subpoints)
+    return [
+        {"time": t, "lat": lat, "lon": lon, "alt": alt}
+        for t, lat, lon, alt in zip(columns["time"], columns["lat"], columns["lon"], columns["alt"])
+    ]
 
 
 def simulate_orbit(tle_line1, tle_line2, name, duration_hours=24, interval_minutes=10):
-    ts = load.timescale()
-    satellite = EarthSatellite(tle_line1, tle_line2, name, ts)
-
-    # Step 1: Generate time steps
-    start_time = datetime.now(timezone.utc)
-    steps = int((duration_hours * 60) / interval_minutes)
-    times = [start_time + timedelta(minutes=i * interval_minutes) for i in range(steps)]
-
-    # Step 2: Convert to Skyfield time objects
-    skyfield_times = ts.utc(
-        [t.year for t in times],
-        [t.month for t in times],
-        [t.day for t in times],
-        [t.hour for t in times],
-        [t.minute for t in times],
-        [t.second for t in times],
-    )
-
-    # Step 3: Compute positions
-    geocentric = satellite.at(skyfield_times)
-    subpoints = geocentric.subpoint()
-
-    results = []
-    for i in range(len(times)):
-        results.append(
-            {
-                "time": times[i].isoformat() + "Z",
-                "lat": round(subpoints.latitude.degrees[i], 4),
-                "lon": round(subpoints.longitude.degrees[i], 4),
-                "alt": round(subpoints.elevation.km[i], 2),
-            }
-        )
-
-    return results
+    times, subpoints = simulate_orbit_arrays(tle_line1, tle_line2, name, duration_hours, interval_minutes)
+    return orbit_points(times, subpoints)
+
+
+def simulate_orbits(tle_pairs, duration_hours=24, interval_minutes=10):
+    """
+    Órbitas de varios objetos en una sola pasada vectorizada sobre la misma rejilla temporal.
+    Las posiciones TEME se leen de la caché de efemérides o se propagan en bloque con SatrecArray,
+    y la conversión a geodésicas se hace una vez para todo el lote. Las nuevas solo se guardan en
+    memoria: la duración y el paso los elige el cliente y cada combinación escribiría un .npy por objeto.
+    Devuelve (times, lat, lon, alt, errores): arrays (N, T) y {fila: (código, mensaje)}.
+    """
+    times, skyfield_times = build_time_grid(None, duration_hours, interval_minutes, align=True)
+    r, errors = propagate_positions(tle_pairs, times, interval_minutes, persist=False)
+    lat, lon, alt = teme_to_geodetic(r, skyfield_times)
+    return times, lat, lon, alt, errors
@@ -1,40 +1,105 @@
-from fastapi import APIRouter, HTTPException
+import tempfile
+from datetime import datetime
+from typing import Literal, Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import or_
 from sqlalchemy.orm import Session
+from app.cdm_ingest import CDM_CHUNK_ROWS, ingest_cdm_binary
 from app.database import SessionLocal
 from app.models import CDM
-from app.schemas import CDMListSchema
+from app.schemas import CDMIngestSchema, CDMPageSchema, CDMSchema
+from app.utils.date_filters import date_range_filter
+from app.utils.pagination import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    build_page,
+    decode_cursor,
+    keyset_page,
+    parse_fields,
+    to_naive_utc,
+)
 
 router = APIRouter()
 
-@router.get("/cdm", response_model=CDMListSchema)
-def get_cdms():
-    """Obtiene todos los CDM (conjunciones) desde la base de datos"""
+# A partir de este tamaño el cuerpo subido se vuelca a disco en lugar de quedarse en memoria
+UPLOAD_SPOOL_BYTES = 16 * 1024 * 1024
+# Columnas que se pueden pedir con fields=
+CDM_FIELDS = tuple(CDMSchema.model_fields)
+
+@router.get("/cdm", response_model=CDMPageSchema)
+def get_cdms(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Filas por página"),
+    cursor: Optional[str] = Query(None, description="next_cursor devuelto por la página anterior"),
+    order_by: Literal["tca", "created"] = Query("tca", description="Columna de ordenación"),
+    descending: bool = Query(False, description="Orden descendente"),
+    tca_from: Optional[datetime] = Query(None, description="TCA desde (incluido)"),
+    tca_to: Optional[datetime] = Query(None, description="TCA hasta (excluido)"),
+    created: Optional[str] = Query(None, description="Fecha de creación: YYYY-MM-DD o rango inicio/fin (ISO 8601)"),
+    pc_min: Optional[float] = Query(None, ge=0, description="Probabilidad de colisión mínima"),
+    min_rng_max: Optional[float] = Query(None, ge=0, description="Distancia mínima máxima (km)"),
+    object_id: Optional[str] = Query(None, description="NORAD ID de cualquiera de los dos objetos"),
+    emergency_reportable: Optional[Literal["Y", "N"]] = Query(None),
+    fields: Optional[str] = Query(None, description="Columnas a devolver, separadas por comas"),
+):
+    """Obtiene los CDM (conjunciones) paginados por cursor, con filtros y selección de columnas"""
+    try:
+        columns = parse_fields(fields, CDM_FIELDS, required=("id", order_by))
+        after = decode_cursor(cursor) if cursor else None
+        created_filter = date_range_filter(CDM.created, created) if created else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     db: Session = SessionLocal()
     try:
-        cdms = db.query(CDM).all()
-        data = [
-            {
-                "id": c.id,
-                "created": c.created,
-                "emergency_reportable": c.emergency_reportable,
-                "tca": c.tca,
-                "min_rng": c.min_rng,
-                "pc": c.pc,
-                "sat_1_id": c.sat_1_id,
-                "sat_1_name": c.sat_1_name,
-                "sat1_object_type": c.sat1_object_type,
-                "sat1_rcs": c.sat1_rcs,
-                "sat_1_excl_vol": c.sat_1_excl_vol,
-                "sat_2_id": c.sat_2_id,
-                "sat_2_name": c.sat_2_name,
-                "sat2_object_type": c.sat2_object_type,
-                "sat2_rcs": c.sat2_rcs,
-                "sat_2_excl_vol": c.sat_2_excl_vol,
-            }
-            for c in cdms
-        ]
-        return {"status": "success", "data": data, "count": len(data)}
+        query = db.query(*(getattr(CDM, name) for name in columns))
+        if tca_from is not None:
+            query = query.filter(CDM.tca >= to_naive_utc(tca_from))
+        if tca_to is not None:
+            query = query.filter(CDM.tca < to_naive_utc(tca_to))
+        if created_filter is not None:
+            query = query.filter(created_filter)
+        if pc_min is not None:
+            query = query.filter(CDM.pc >= pc_min)
+        if min_rng_max is not None:
+            query = query.filter(CDM.min_rng <= min_rng_max)
+        if object_id:
+            query = query.filter(or_(CDM.sat_1_id == object_id, CDM.sat_2_id == object_id))
+        if emergency_reportable:
+            query = query.filter(CDM.emergency_reportable == emergency_reportable)
+        query = keyset_page(query, getattr(CDM, order_by), CDM.id, after, descending)
+
+        rows = [row._asdict() for row in query.limit(limit + 1)]
+        data, next_cursor = build_page(rows, limit, order_by)
+        return {"status": "success", "data": data, "count": len(data), "next_cursor": next_cursor}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error obteniendo CDMs: {str(e)}")
     finally:
         db.close()
+
+
+@router.post("/cdm/upload", response_model=CDMIngestSchema)
+async def upload_cdms(
+    request: Request,
+    chunk_rows: int = Query(CDM_CHUNK_ROWS, ge=100, le=100_000, description="Filas por bloque de inserción"),
+    evaluate_alerts: bool = Query(True, description="Evaluar alertas para los CDMs nuevos"),
+):
+    """
+    Ingesta un CSV de CDMs enviado como cuerpo de la petición (text/csv; admite Content-Encoding: gzip).
+    Los CDM_ID ya existentes se ignoran y solo los nuevos se encolan para evaluar alertas.
+    """
+    gzipped = request.headers.get("content-encoding", "").lower() == "gzip"
+    with tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_BYTES) as spool:
+        async for chunk in request.stream():
+            spool.write(chunk)
+        spool.seek(0)
+        try:
+            stats = await run_in_threadpool(
+                ingest_cdm_binary, spool, gzipped=gzipped, chunk_rows=chunk_rows, evaluate_alerts=evaluate_alerts
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"CSV de CDMs no válido: {str(e)}")
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error ingestando CDMs: {str(e)}")
+    return {"status": "success", "data": stats}
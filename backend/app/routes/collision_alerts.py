@@ -1,36 +1,163 @@
-from fastapi import APIRouter, HTTPException
+import asyncio
+from datetime import datetime
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Header, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, or_
 from sqlalchemy.orm import Session
 from app.database import SessionLocal
 from app.models import CollisionAlert
-from app.schemas import CollisionAlertListSchema
+from app.schemas import CollisionAlertPageSchema, CollisionAlertSchema
+from app.utils.alert_broadcaster import alert_broadcaster
+from app.utils.date_filters import date_range_filter
+from app.utils.pagination import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    build_page,
+    decode_cursor,
+    keyset_page,
+    parse_fields,
+    to_naive_utc,
+)
 
 router = APIRouter()
 
-@router.get("/collision-alerts", response_model=CollisionAlertListSchema)
-def get_collision_alerts():
-    """Obtiene solo alertas de colisión críticas desde la base de datos"""
+# Alertas por lectura del stream y segundos entre keepalives (también relee la base por si escribió otro proceso)
+ALERT_STREAM_BATCH = 500
+ALERT_STREAM_KEEPALIVE_S = 15.0
+# Columnas que se pueden pedir con fields=
+ALERT_FIELDS = tuple(CollisionAlertSchema.model_fields)
+
+
+def _serialize_alert(a):
+    return {
+        "id": a.id,
+        "cdm_id": a.cdm_id,
+        "created": a.created,
+        "tca": a.tca,
+        "min_rng": a.min_rng,
+        "pc": a.pc,
+        "sat_1_id": a.sat_1_id,
+        "sat_1_name": a.sat_1_name,
+        "sat_2_id": a.sat_2_id,
+        "sat_2_name": a.sat_2_name,
+        "risk_level": a.risk_level,
+        "alert_reason": a.alert_reason,
+    }
+
+
+@router.get("/collision-alerts", response_model=CollisionAlertPageSchema)
+def get_collision_alerts(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Filas por página"),
+    cursor: Optional[str] = Query(None, description="next_cursor devuelto por la página anterior"),
+    order_by: Literal["tca", "created"] = Query("tca", description="Columna de ordenación"),
+    descending: bool = Query(False, description="Orden descendente"),
+    tca_from: Optional[datetime] = Query(None, description="TCA desde (incluido)"),
+    tca_to: Optional[datetime] = Query(None, description="TCA hasta (excluido)"),
+    created: Optional[str] = Query(None, description="Fecha de creación: YYYY-MM-DD o rango inicio/fin (ISO 8601)"),
+    pc_min: Optional[float] = Query(None, ge=0, description="Probabilidad de colisión mínima"),
+    min_rng_max: Optional[float] = Query(None, ge=0, description="Distancia mínima máxima (km)"),
+    object_id: Optional[str] = Query(None, description="NORAD ID de cualquiera de los dos objetos"),
+    risk_level: Optional[Literal["HIGH", "MEDIUM", "LOW"]] = Query(None),
+    fields: Optional[str] = Query(None, description="Columnas a devolver, separadas por comas"),
+):
+    """Obtiene las alertas de colisión paginadas por cursor, con filtros y selección de columnas"""
+    try:
+        columns = parse_fields(fields, ALERT_FIELDS, required=("id", order_by))
+        after = decode_cursor(cursor) if cursor else None
+        created_filter = date_range_filter(CollisionAlert.created, created) if created else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     db: Session = SessionLocal()
     try:
-        alerts = db.query(CollisionAlert).all()
-        data = [
-            {
-                "id": a.id,
-                "cdm_id": a.cdm_id,
-                "created": a.created,
-                "tca": a.tca,
-                "min_rng": a.min_rng,
-                "pc": a.pc,
-                "sat_1_id": a.sat_1_id,
-                "sat_1_name": a.sat_1_name,
-                "sat_2_id": a.sat_2_id,
-                "sat_2_name": a.sat_2_name,
-                "risk_level": a.risk_level,
-                "alert_reason": a.alert_reason,
-            }
-            for a in alerts
-        ]
-        return {"status": "success", "data": data, "count": len(data)}
+        query = db.query(*(getattr(CollisionAlert, name) for name in columns))
+        if tca_from is not None:
+            query = query.filter(CollisionAlert.tca >= to_naive_utc(tca_from))
+        if tca_to is not None:
+            query = query.filter(CollisionAlert.tca < to_naive_utc(tca_to))
+        if created_filter is not None:
+            query = query.filter(created_filter)
+        if pc_min is not None:
+            query = query.filter(CollisionAlert.pc >= pc_min)
+        if min_rng_max is not None:
+            query = query.filter(CollisionAlert.min_rng <= min_rng_max)
+        if object_id:
+            query = query.filter(or_(CollisionAlert.sat_1_id == object_id, CollisionAlert.sat_2_id == object_id))
+        if risk_level:
+            query = query.filter(CollisionAlert.risk_level == risk_level)
+        query = keyset_page(query, getattr(CollisionAlert, order_by), CollisionAlert.id, after, descending)
+
+        rows = [row._asdict() for row in query.limit(limit + 1)]
+        data, next_cursor = build_page(rows, limit, order_by)
+        return {"status": "success", "data": data, "count": len(data), "next_cursor": next_cursor}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error obteniendo alertas de colisión: {str(e)}")
     finally:
         db.close()
+
+
+def _alerts_after(cursor, limit):
+    db: Session = SessionLocal()
+    try:
+        query = db.query(CollisionAlert)
+        if cursor is not None:
+            query = query.filter(CollisionAlert.id > cursor)
+        return [_serialize_alert(a) for a in query.order_by(CollisionAlert.id).limit(limit).all()]
+    finally:
+        db.close()
+
+
+def _latest_alert_id():
+    db: Session = SessionLocal()
+    try:
+        return db.query(func.max(CollisionAlert.id)).scalar() or 0
+    finally:
+        db.close()
+
+
+@router.get("/collision-alerts/stream")
+async def stream_collision_alerts(
+    request: Request,
+    after: Optional[int] = Query(None, ge=0, description="Enviar alertas con id mayor que este cursor (0 = todas)"),
+    last_event_id: Optional[str] = Header(None),
+):
+    """
+    Stream (Server-Sent Events) de alertas de colisión nuevas. Cada evento lleva como id el de la alerta,
+    así que al reconectar el navegador envía Last-Event-ID y recibe solo lo que se perdió.
+    Sin cursor se empieza por las alertas que se creen a partir de ahora.
+    """
+    if after is None and last_event_id and last_event_id.isdigit():
+        after = int(last_event_id)
+    cursor = after if after is not None else await run_in_threadpool(_latest_alert_id)
+
+    async def events():
+        nonlocal cursor
+        subscriber = alert_broadcaster.subscribe()
+        _, wakeup = subscriber
+        try:
+            yield f"retry: 5000\nevent: ready\ndata: {{\"cursor\": {cursor}}}\n\n"
+            while not await request.is_disconnected():
+                # Se limpia antes de leer: una notificación durante la consulta provoca otra lectura
+                wakeup.clear()
+                alerts = await run_in_threadpool(_alerts_after, cursor, ALERT_STREAM_BATCH)
+                for alert in alerts:
+                    cursor = alert["id"]
+                    payload = CollisionAlertSchema(**alert).model_dump_json()
+                    yield f"id: {cursor}\nevent: alert\ndata: {payload}\n\n"
+                if len(alerts) == ALERT_STREAM_BATCH:
+                    continue
+                try:
+                    await asyncio.wait_for(wakeup.wait(), timeout=ALERT_STREAM_KEEPALIVE_S)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+        finally:
+            alert_broadcaster.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
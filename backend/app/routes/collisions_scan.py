@@ -1,47 +1,59 @@
+from datetime import datetime
+
 from fastapi import APIRouter, HTTPException, Query, BackgroundTasks
 from sqlalchemy.orm import Session
-from skyfield.api import load
-from app.collision_detector import detect_close_approaches
 from app.database import SessionLocal
 from app.models import Satellite, CollisionAlert
+from app.utils.alert_broadcaster import alert_broadcaster
+from app.utils.stats_cache import stats_cache
 from app.utils.collision_utils import run_collision_scan_logic
+from app.utils.primary_screening import SCREENING_MAX_HOURS, screen_primary
 from app.schemas import MessageSchema
 
 router = APIRouter()
 
-ts = load.timescale()
-
 @router.get("/collision-scan", response_model=MessageSchema)
-def trigger_scan(background_tasks: BackgroundTasks):
-    background_tasks.add_task(run_collision_scan)
+def trigger_scan(
+    background_tasks: BackgroundTasks,
+    screening_km: float = Query(None, gt=0, description="Radio del volumen de cribado (km); por defecto se deriva del umbral y el paso"),
+    orbit_path_filter: bool = Query(False, description="Aplicar el filtro geométrico de línea de nodos"),
+):
+    background_tasks.add_task(run_collision_scan, screening_km=screening_km, orbit_path_filter=orbit_path_filter)
     return {"message": "🛰️ Collision scan started in the background."}
 
-def run_collision_scan():
+def run_collision_scan(screening_km=None, orbit_path_filter=False):
     db: Session = SessionLocal()
     try:
-        db.query(CollisionAlert).delete()
+        # Solo se reemplazan las alertas del escaneo; las generadas desde CDM se conservan
+        db.query(CollisionAlert).filter(CollisionAlert.cdm_id.is_(None)).delete(synchronize_session=False)
         db.commit()
         satellites = db.query(Satellite).filter(Satellite.object_type.notin_(["DEBRIS", "ROCKET BODY"])).all()
         debris_and_rocket = db.query(Satellite).filter(Satellite.object_type.in_(["DEBRIS", "ROCKET BODY"])).all()
-        results = run_collision_scan_logic(satellites, debris_and_rocket, detect_close_approaches, threshold_km=5)
-        total_alerts = 0
-        for sat_a, sat_b, time, distance_km in results:
-            existing = (
-                db.query(CollisionAlert)
-                .filter_by(sat_a=sat_a, sat_b=sat_b, time=time)
-                .first()
+        results, stats = run_collision_scan_logic(
+            satellites, debris_and_rocket, threshold_km=5, screening_km=screening_km, orbit_path_filter=orbit_path_filter
+        )
+        print(f"🛰️ Collision scan stats: {stats}")
+        now = datetime.utcnow()
+        db.add_all(
+            CollisionAlert(
+                created=now,
+                tca=r["time"],
+                min_rng=r["distance_km"],
+                sat_1_id=r["sat_1_id"],
+                sat_1_name=r["sat_1_name"],
+                sat_2_id=r["sat_2_id"],
+                sat_2_name=r["sat_2_name"],
+                alert_reason=(
+                    f"Screening: distancia {r['distance_km']} km, "
+                    f"velocidad relativa {r['relative_velocity_km_s']} km/s, Pc máximo {r['pc_max']:.1e}"
+                ),
             )
-            if not existing:
-                alert = CollisionAlert(
-                    sat_a=sat_a,
-                    sat_b=sat_b,
-                    time=time,
-                    distance_km=distance_km,
-                )
-                db.add(alert)
-                total_alerts += 1
+            for r in results
+        )
         db.commit()
-        return {"message": f"Scan complete. {total_alerts} close approaches found."}
+        alert_broadcaster.notify()
+        stats_cache.invalidate()
+        return {"message": f"Scan complete. {len(results)} close approaches found."}
     finally:
         db.close()
 
@@ -56,10 +68,10 @@ def collision_check(norad1: int = Query(...), norad2: int = Query(...)):
     alerts = (
         db.query(CollisionAlert)
         .filter(
-            ((CollisionAlert.sat_a == sat1.name) & (CollisionAlert.sat_b == sat2.name))
-            | ((CollisionAlert.sat_a == sat2.name) & (CollisionAlert.sat_b == sat1.name))
+            ((CollisionAlert.sat_1_id == str(norad1)) & (CollisionAlert.sat_2_id == str(norad2)))
+            | ((CollisionAlert.sat_1_id == str(norad2)) & (CollisionAlert.sat_2_id == str(norad1)))
         )
-        .order_by(CollisionAlert.time.asc())
+        .order_by(CollisionAlert.tca.asc())
         .all()
     )
     db.close()
@@ -67,11 +79,36 @@ def collision_check(norad1: int = Query(...), norad2: int = Query(...)):
         "satellite_1": {"norad_id": norad1, "name": sat1.name},
         "satellite_2": {"norad_id": norad2, "name": sat2.name},
         "close_approaches": [
-            {"time": alert.time, "distance_km": round(alert.distance_km, 3)}
+            {"time": alert.tca, "distance_km": round(alert.min_rng, 3) if alert.min_rng is not None else None}
             for alert in alerts
         ],
     }
 
+@router.get("/collision/screen/{norad_id}")
+def screen_single_object(
+    norad_id: int,
+    hours: float = Query(24, gt=0, le=SCREENING_MAX_HOURS, description="Ventana de cribado (horas)"),
+    interval_minutes: float = Query(10, ge=1, le=60, description="Paso de la rejilla gruesa (minutos)"),
+    threshold_km: float = Query(5.0, gt=0, le=50, description="Distancia máxima de los encuentros (km)"),
+    orbit_path_filter: bool = Query(True, description="Aplicar el filtro geométrico de línea de nodos"),
+    limit: int = Query(50, ge=1, le=500, description="Encuentros devueltos, del más cercano al más lejano"),
+):
+    """Cribado bajo demanda de un objeto contra todo el catálogo: encuentros ordenados por distancia mínima"""
+    db: Session = SessionLocal()
+    try:
+        result = screen_primary(
+            db, norad_id, duration_hours=hours, interval_minutes=interval_minutes,
+            threshold_km=threshold_km, orbit_path_filter=orbit_path_filter,
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error en el cribado: {str(e)}")
+    finally:
+        db.close()
+    if result is None:
+        raise HTTPException(status_code=404, detail="Satellite not found")
+    encounters = result["encounters"][:limit]
+    return {"status": "success", "data": {**result, "encounters": encounters}, "count": len(encounters)}
+
 @router.get("/top-collision")
 def get_top_collisions(limit: int = 5):
     db: Session = SessionLocal()
@@ -85,10 +122,10 @@ def get_top_collisions(limit: int = 5):
         )
         return [
             {
-                "time": alert.time,
-                "sat_a": alert.sat_a,
-                "sat_b": alert.sat_b,
-                "distance_km": round(alert.distance_km, 3),
+                "time": alert.tca,
+                "sat_a": alert.sat_1_name,
+                "sat_b": alert.sat_2_name,
+                "distance_km": round(alert.min_rng, 3),
             }
             for alert in alerts
         ]
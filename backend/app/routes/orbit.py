@@ -1,25 +1,55 @@
-from fastapi import APIRouter, HTTPException
+import os
+from typing import Literal
+
+import numpy as np
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response
 from sqlalchemy.orm import Session
 
+from app.collision_detector import grid_steps
 from app.database import SessionLocal
 from app.models import Satellite
-from app.orbitSimulator import simulate_orbit
+from app.orbitSimulator import (
+    orbit_binary,
+    orbit_columns,
+    orbit_points,
+    orbit_times_iso,
+    simulate_orbit_arrays,
+    simulate_orbits,
+)
+from app.schemas import OrbitBatchRequestSchema
 
 router = APIRouter()
 
+# Límites de /orbit/batch: objetos por petición, duración, paso mínimo y puntos totales (objetos x pasos)
+ORBIT_BATCH_MAX_OBJECTS = int(os.getenv("ORBIT_BATCH_MAX_OBJECTS", "2000"))
+ORBIT_MAX_DURATION_HOURS = float(os.getenv("ORBIT_MAX_DURATION_HOURS", "72"))
+ORBIT_MIN_INTERVAL_MINUTES = float(os.getenv("ORBIT_MIN_INTERVAL_MINUTES", "1"))
+ORBIT_BATCH_MAX_POINTS = int(os.getenv("ORBIT_BATCH_MAX_POINTS", "500000"))
+# NORAD IDs por consulta IN
+ORBIT_ID_BATCH = 900
+
 
 @router.get("/orbit/norad/{norad_id}")
-def get_orbit_by_norad(norad_id):
+def get_orbit_by_norad(
+    norad_id,
+    format: Literal["points", "columns", "binary"] = Query(
+        "points", description="points: lista de puntos; columns: listas paralelas; binary: float32 lat/lon/alt"
+    ),
+):
     db: Session = SessionLocal()
-
-    # Step 1: Fetch the satellite by ID
-    satellite = db.query(Satellite).filter(Satellite.norad_id == norad_id).first()
+    try:
+        # Step 1: Fetch the satellite by ID
+        satellite = db.query(Satellite).filter(Satellite.norad_id == norad_id).first()
+    finally:
+        db.close()
 
     if not satellite:
         raise HTTPException(status_code=404, detail="Satellite not found")
 
-    # Step 2: Simulate the orbit using Skyfield
-    result = simulate_orbit(
+    # Step 2: Simulate the orbit with the batched SGP4 propagator
+    times, subpoints = simulate_orbit_arrays(
         satellite.tle_line1,
         satellite.tle_line2,
         satellite.name,
@@ -27,5 +57,102 @@ def get_orbit_by_norad(norad_id):
         interval_minutes=10,
     )
 
-    db.close()
-    return result
+    if format == "binary":
+        return Response(
+            content=orbit_binary(subpoints),
+            media_type="application/octet-stream",
+            headers={
+                "X-Orbit-Start": orbit_times_iso(times[:1])[0],
+                "X-Orbit-Interval-Minutes": "10",
+                "X-Orbit-Steps": str(len(times)),
+                "X-Orbit-Layout": "lat,lon,alt;float32le",
+            },
+        )
+    if format == "columns":
+        return JSONResponse(content=orbit_columns(times, subpoints))
+    return JSONResponse(content=orbit_points(times, subpoints))
+
+
+def _load_batch_objects(request):
+    columns = (Satellite.norad_id, Satellite.name, Satellite.object_type, Satellite.tle_line1, Satellite.tle_line2)
+    db: Session = SessionLocal()
+    try:
+        if request.norad_ids:
+            norad_ids = list(dict.fromkeys(request.norad_ids))
+            found = []
+            for i in range(0, len(norad_ids), ORBIT_ID_BATCH):
+                found += db.query(*columns).filter(Satellite.norad_id.in_(norad_ids[i : i + ORBIT_ID_BATCH])).all()
+            by_id = {row.norad_id: row for row in found}
+            return [by_id[n] for n in norad_ids if n in by_id], [n for n in norad_ids if n not in by_id]
+        query = db.query(*columns)
+        if request.object_type:
+            query = query.filter(Satellite.object_type == request.object_type)
+        if request.source:
+            query = query.filter(Satellite.source == request.source)
+        rows = query.order_by(Satellite.norad_id).limit(ORBIT_BATCH_MAX_OBJECTS + 1).all()
+        if len(rows) > ORBIT_BATCH_MAX_OBJECTS:
+            raise ValueError(f"el filtro devuelve más de {ORBIT_BATCH_MAX_OBJECTS} objetos; acótelo o pase norad_ids")
+        return rows, []
+    finally:
+        db.close()
+
+
+def _batch_orbit_payload(objects, not_found, duration_hours, interval_minutes):
+    times, lat, lon, alt, errors = simulate_orbits(
+        [(o.tle_line1, o.tle_line2) for o in objects], duration_hours, interval_minutes
+    )
+    # Los objetos que sgp4 no puede propagar en algún instante se devuelven aparte, sin filas con NaN
+    ok = [row for row in range(len(objects)) if row not in errors]
+    return {
+        "status": "success",
+        "data": {
+            "times": orbit_times_iso(times),
+            "norad_id": [objects[row].norad_id for row in ok],
+            "name": [objects[row].name for row in ok],
+            "object_type": [objects[row].object_type for row in ok],
+            "lat": np.round(lat[ok], 4).tolist(),
+            "lon": np.round(lon[ok], 4).tolist(),
+            "alt": np.round(alt[ok], 2).tolist(),
+            "errors": {objects[row].norad_id: message for row, (_, message) in errors.items()},
+            "not_found": not_found,
+        },
+        "count": len(ok),
+    }
+
+
+@router.post("/orbit/batch")
+async def get_orbits_batch(request: OrbitBatchRequestSchema):
+    """
+    Órbitas de varios objetos en una sola petición: por lista de norad_ids o por filtro (object_type/source).
+    Respuesta en columnas: una lista de instantes compartida y matrices lat/lon/alt de objetos x instantes.
+    """
+    if not request.norad_ids and not (request.object_type or request.source):
+        raise HTTPException(status_code=400, detail="Indique norad_ids o un filtro (object_type/source)")
+    if request.norad_ids and len(request.norad_ids) > ORBIT_BATCH_MAX_OBJECTS:
+        raise HTTPException(status_code=400, detail=f"Máximo {ORBIT_BATCH_MAX_OBJECTS} objetos por petición")
+    if not 0 < request.duration_hours <= ORBIT_MAX_DURATION_HOURS:
+        raise HTTPException(status_code=400, detail=f"duration_hours debe estar entre 0 y {ORBIT_MAX_DURATION_HOURS}")
+    if request.interval_minutes < ORBIT_MIN_INTERVAL_MINUTES:
+        raise HTTPException(status_code=400, detail=f"interval_minutes mínimo: {ORBIT_MIN_INTERVAL_MINUTES}")
+    if request.interval_minutes > request.duration_hours * 60:
+        raise HTTPException(status_code=400, detail="interval_minutes no puede superar la duración")
+    steps = grid_steps(request.duration_hours, request.interval_minutes)
+
+    try:
+        objects, not_found = await run_in_threadpool(_load_batch_objects, request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if len(objects) * steps > ORBIT_BATCH_MAX_POINTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"{len(objects)} objetos x {steps} pasos supera el máximo de {ORBIT_BATCH_MAX_POINTS} puntos",
+        )
+
+    try:
+        payload = await run_in_threadpool(
+            _batch_orbit_payload, objects, not_found, request.duration_hours, request.interval_minutes
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error propagando órbitas: {str(e)}")
+    # Listas ya serializables: se evita jsonable_encoder, que recorre cada número del payload
+    return JSONResponse(content=payload)
@@ -0,0 +1,47 @@
+import time
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Header, HTTPException, Query, Response
+from fastapi.concurrency import run_in_threadpool
+
+from app.utils.position_snapshot import POSITIONS_BINARY_LAYOUT, position_snapshot
+
+router = APIRouter()
+
+
+@router.get("/positions/now")
+async def get_positions_now(
+    format: Literal["json", "binary"] = Query(
+        "json", description="json: listas paralelas; binary: int32 norad_id + float32 lat/lon/alt"
+    ),
+    accept_encoding: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+):
+    """
+    Posición actual (lat, lon, alt) de todo el catálogo. La instantánea se comparte entre peticiones
+    durante unos segundos, así que muchos visores no multiplican el coste de propagación.
+    """
+    gzipped = "gzip" in (accept_encoding or "")
+    key = f"{format}+gzip" if gzipped else format
+    try:
+        snapshot, body = await run_in_threadpool(position_snapshot.get, key)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error calculando posiciones: {str(e)}")
+
+    epoch = snapshot["epoch"].strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+    remaining = max(0, int(position_snapshot.ttl_s - (time.monotonic() - snapshot["computed_at"])))
+    headers = {
+        "ETag": f'"{snapshot["epoch"].timestamp():.3f}-{key}"',
+        "Cache-Control": f"public, max-age={remaining}",
+        "Vary": "Accept-Encoding",
+        "X-Positions-Epoch": epoch,
+        "X-Positions-Count": str(len(snapshot["norad_ids"])),
+    }
+    if if_none_match == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    if gzipped:
+        headers["Content-Encoding"] = "gzip"
+    if format == "binary":
+        headers["X-Positions-Layout"] = POSITIONS_BINARY_LAYOUT
+        return Response(content=body, media_type="application/octet-stream", headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
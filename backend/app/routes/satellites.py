@@ -1,35 +1,99 @@
+import csv
+import io
+import json
+import zlib
+from typing import Literal
+
+import numpy as np
 from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, select
 from app.database import SessionLocal
 from app.models import Satellite, CollisionAlert
+from app.utils.date_filters import date_range_filter
+from app.utils.name_search import name_contains, search_names
+from app.utils.position_snapshot import position_snapshot
+from app.utils.stats_cache import stats_cache
 from app.utils.stats_utils import calculate_satellite_stats, calculate_debris_stats
-from app.schemas import SatelliteListSchema, SatelliteDetailSchema, SatelliteStatsSchema
+from app.schemas import SatelliteListSchema, SatelliteDetailSchema, SatelliteSearchSchema, SatelliteStatsSchema
 
 router = APIRouter()
 
+# Filas leídas por vuelta del cursor (servidor en PostgreSQL) al exportar el catálogo
+EXPORT_YIELD_PER = 2000
+EXPORT_COLUMNS = (
+    "id", "norad_id", "name", "tle_line1", "tle_line2", "object_type", "source", "created_at", "updated_at",
+)
+
+
+def _filter_satellites(query, norad_id=None, name=None, object_type=None, created_at=None, updated_at=None):
+    """Aplica los filtros permitidos del listado de satélites (no por source ni TLEs)."""
+    if norad_id is not None:
+        query = query.filter(Satellite.norad_id == norad_id)
+    if name:
+        query = query.filter(name_contains(name))
+    if object_type:
+        query = query.filter(Satellite.object_type == object_type)
+    if created_at:
+        query = query.filter(date_range_filter(Satellite.created_at, created_at))
+    if updated_at:
+        query = query.filter(date_range_filter(Satellite.updated_at, updated_at))
+    return query
+
+
+def _export_rows(stmt):
+    """Recorre la consulta por bloques de EXPORT_YIELD_PER filas; la sesión vive lo que dure el stream."""
+    db: Session = SessionLocal()
+    try:
+        result = db.execute(stmt.execution_options(yield_per=EXPORT_YIELD_PER))
+        for partition in result.partitions():
+            yield partition
+    finally:
+        db.close()
+
+
+def _ndjson_chunks(stmt):
+    for partition in _export_rows(stmt):
+        yield "".join(
+            json.dumps(dict(zip(EXPORT_COLUMNS, row)), default=lambda v: v.isoformat()) + "\n" for row in partition
+        ).encode()
+
+
+def _csv_chunks(stmt):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for partition in _export_rows(stmt):
+        writer.writerows(partition)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def _gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
 @router.get("/satellites", response_model=SatelliteListSchema)
 def get_satellites(
     norad_id: int = Query(None, description="NORAD ID del satélite"),
     name: str = Query(None, description="Nombre (o parte) del satélite"),
     object_type: str = Query(None, description="Tipo de objeto (ej: PAYLOAD, DEBRIS, ROCKET BODY)"),
-    created_at: str = Query(None, description="Fecha de creación (YYYY-MM-DD opcional)"),
-    updated_at: str = Query(None, description="Fecha de actualización (YYYY-MM-DD opcional)")
+    created_at: str = Query(None, description="Fecha de creación: YYYY-MM-DD o rango inicio/fin (ISO 8601)"),
+    updated_at: str = Query(None, description="Fecha de actualización: YYYY-MM-DD o rango inicio/fin (ISO 8601)")
 ):
     """Obtiene lista de satélites filtrando solo por parámetros permitidos (no por source ni TLEs)"""
     db: Session = SessionLocal()
     try:
-        query = db.query(Satellite)
-        if norad_id is not None:
-            query = query.filter(Satellite.norad_id == norad_id)
-        if name:
-            query = query.filter(Satellite.name.ilike(f"%{name}%"))
-        if object_type:
-            query = query.filter(Satellite.object_type == object_type)
-        if created_at:
-            query = query.filter(Satellite.created_at.cast("date") == created_at)
-        if updated_at:
-            query = query.filter(Satellite.updated_at.cast("date") == updated_at)
+        query = _filter_satellites(db.query(Satellite), norad_id, name, object_type, created_at, updated_at)
         satellites = query.all()
         data = [
             {
@@ -46,14 +110,66 @@ def get_satellites(
             for s in satellites
         ]
         return {"status": "success", "data": data, "count": len(data)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error obteniendo satélites: {str(e)}")
     finally:
         db.close()
 
+@router.get("/satellites/export")
+def export_satellites(
+    format: Literal["ndjson", "csv"] = Query("ndjson", description="Formato de exportación"),
+    gzip: bool = Query(False, description="Comprimir la respuesta con gzip"),
+    norad_id: int = Query(None, description="NORAD ID del satélite"),
+    name: str = Query(None, description="Nombre (o parte) del satélite"),
+    object_type: str = Query(None, description="Tipo de objeto (ej: PAYLOAD, DEBRIS, ROCKET BODY)"),
+    created_at: str = Query(None, description="Fecha de creación: YYYY-MM-DD o rango inicio/fin (ISO 8601)"),
+    updated_at: str = Query(None, description="Fecha de actualización: YYYY-MM-DD o rango inicio/fin (ISO 8601)")
+):
+    """Exporta el catálogo en streaming (NDJSON o CSV) sin cargarlo entero en memoria"""
+    stmt = select(*(getattr(Satellite, column) for column in EXPORT_COLUMNS)).order_by(Satellite.norad_id)
+    try:
+        stmt = _filter_satellites(stmt, norad_id, name, object_type, created_at, updated_at)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    chunks = _ndjson_chunks(stmt) if format == "ndjson" else _csv_chunks(stmt)
+    media_type = "application/x-ndjson" if format == "ndjson" else "text/csv"
+    headers = {"Content-Disposition": f'attachment; filename="satellites.{format}"'}
+    if gzip:
+        chunks = _gzip_chunks(chunks)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(chunks, media_type=media_type, headers=headers)
+
+@router.get("/satellites/search", response_model=SatelliteSearchSchema)
+def search_satellites(
+    q: str = Query(..., min_length=1, max_length=64, description="Texto a buscar en el nombre"),
+    limit: int = Query(10, ge=1, le=50, description="Número máximo de resultados"),
+    object_type: str = Query(None, description="Tipo de objeto (ej: PAYLOAD, DEBRIS, ROCKET BODY)"),
+):
+    """Autocompletado de nombres: coincidencias ordenadas (exacta, prefijo, palabra, subcadena) usando el índice de trigramas"""
+    db: Session = SessionLocal()
+    try:
+        rows = search_names(db, q, limit, object_type)
+        data = [{"norad_id": r.norad_id, "name": r.name, "object_type": r.object_type} for r in rows]
+        return {"status": "success", "data": data, "count": len(data)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error buscando satélites: {str(e)}")
+    finally:
+        db.close()
+
 @router.get("/satellites/stats", response_model=SatelliteStatsSchema)
 def get_satellite_stats():
-    """Devuelve estadísticas de satélites por tipo de objeto"""
+    """Devuelve estadísticas de satélites por tipo de objeto y régimen orbital"""
+    try:
+        return {
+            "status": "success",
+            "data": stats_cache.get("satellite_stats", _compute_satellite_stats)
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error obteniendo estadísticas: {str(e)}")
+
+def _compute_satellite_stats():
     db: Session = SessionLocal()
     try:
         total = db.query(func.count(Satellite.id)).scalar()
@@ -62,15 +178,14 @@ def get_satellite_stats():
             .group_by(Satellite.object_type)
             .all()
         )
-        stats = calculate_satellite_stats(by_type, total)
-        return {
-            "status": "success",
-            "data": stats
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error obteniendo estadísticas: {str(e)}")
     finally:
         db.close()
+    # Altitud actual de la instantánea de posiciones compartida (catálogo ya compilado); los objetos
+    # que no se pudieron propagar cuentan como "unavailable"
+    snapshot, _ = position_snapshot.get()
+    unavailable = snapshot["catalog_count"] - len(snapshot["norad_ids"])
+    altitudes = np.concatenate([snapshot["positions"][:, 2], np.full(unavailable, np.nan)])
+    return calculate_satellite_stats(by_type, total, altitudes)
 
 @router.get("/satellites/{norad_id}", response_model=SatelliteDetailSchema)
 def get_satellite(norad_id: int):
@@ -145,19 +260,62 @@ def get_debris():
     finally:
         db.close()
 
+def _compute_debris_stats():
+    db: Session = SessionLocal()
+    try:
+        by_origin = (
+            db.query(Satellite.origin, func.count(Satellite.id))
+            .filter(Satellite.object_type == "DEBRIS")
+            .group_by(Satellite.origin)
+            .all()
+        )
+        return calculate_debris_stats(by_origin)
+    finally:
+        db.close()
+
+
 @router.get("/debris/stats")
 def get_debris_stats():
     """Devuelve estadísticas de debris por origen y prioridad (object_type=DEBRIS)"""
-    db: Session = SessionLocal()
     try:
-        debris = db.query(Satellite).filter(Satellite.object_type == "DEBRIS").all()
-        stats = calculate_debris_stats(debris)
         return {
             "status": "success",
-            "data": stats
+            "data": stats_cache.get("debris_stats", _compute_debris_stats)
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error obteniendo estadísticas de debris: {str(e)}")
+
+@router.get("/debris/filter", response_model=SatelliteListSchema)
+def filter_debris(
+    norad_id: int = Query(None, description="NORAD ID del debris"),
+    name: str = Query(None, description="Nombre (o parte) del debris"),
+    created_at: str = Query(None, description="Fecha de creación: YYYY-MM-DD o rango inicio/fin (ISO 8601)"),
+    updated_at: str = Query(None, description="Fecha de actualización: YYYY-MM-DD o rango inicio/fin (ISO 8601)")
+):
+    """Filtra debris por los mismos parámetros permitidos (ahora incluye TLE y fuente en la respuesta)"""
+    db: Session = SessionLocal()
+    try:
+        query = _filter_satellites(db.query(Satellite), norad_id, name, "DEBRIS", created_at, updated_at)
+        debris_list = query.all()
+        data = [
+            {
+                "id": d.id,
+                "norad_id": d.norad_id,
+                "name": d.name,
+                "tle_line1": d.tle_line1,
+                "tle_line2": d.tle_line2,
+                "object_type": d.object_type,
+                "source": d.source,
+                "created_at": d.created_at,
+                "updated_at": d.updated_at,
+            }
+            for d in debris_list
+        ]
+        return {"status": "success", "data": data, "count": len(data)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error filtrando debris: {str(e)}")
     finally:
         db.close()
 
@@ -210,43 +368,3 @@ def get_debris_by_norad(norad_id: int):
         raise HTTPException(status_code=500, detail=f"Error obteniendo debris: {str(e)}")
     finally:
         db.close()
-
-@router.get("/debris/filter", response_model=SatelliteListSchema)
-def filter_debris(
-    norad_id: int = Query(None, description="NORAD ID del debris"),
-    name: str = Query(None, description="Nombre (o parte) del debris"),
-    created_at: str = Query(None, description="Fecha de creación (YYYY-MM-DD opcional)"),
-    updated_at: str = Query(None, description="Fecha de actualización (YYYY-MM-DD opcional)")
-):
-    """Filtra debris por los mismos parámetros permitidos (ahora incluye TLE y fuente en la respuesta)"""
-    db: Session = SessionLocal()
-    try:
-        query = db.query(Satellite).filter(Satellite.object_type == "DEBRIS")
-        if norad_id is not None:
-            query = query.filter(Satellite.norad_id == norad_id)
-        if name:
-            query = query.filter(Satellite.name.ilike(f"%{name}%"))
-        if created_at:
-            query = query.filter(Satellite.created_at.cast("date") == created_at)
-        if updated_at:
-            query = query.filter(Satellite.updated_at.cast("date") == updated_at)
-        debris_list = query.all()
-        data = [
-            {
-                "id": d.id,
-                "norad_id": d.norad_id,
-                "name": d.name,
-                "tle_line1": d.tle_line1,
-                "tle_line2": d.tle_line2,
-                "object_type": d.object_type,
-                "source": d.source,
-                "created_at": d.created_at,
-                "updated_at": d.updated_at,
-            }
-            for d in debris_list
-        ]
-        return {"status": "success", "data": data, "count": len(data)}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error filtrando debris: {str(e)}")
-    finally:
-        db.close()
@@ -1,30 +1,83 @@
+from datetime import datetime
+
 from fastapi import APIRouter, HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from app.database import SessionLocal
-from app.models import Satellite, CDM, TLEMetadata, CollisionAlert
+from app.models import Satellite, CDM, TLEMetadata, CollisionAlert, TLESourceState
+from app.tle_fetcher import get_refresh_state
+from app.utils.alert_queue import alert_queue
+from app.utils.stats_cache import stats_cache
 from app.utils.stats_utils import build_system_summary
-from app.schemas import SummarySchema
+from app.schemas import ReadinessSchema, SummarySchema
 
 router = APIRouter()
 
-@router.get("/summary", response_model=SummarySchema)
-def get_summary():
-    """Obtiene resumen general del sistema desde la base de datos"""
+# Horas sin actualizar el catálogo a partir de las que los datos se consideran desactualizados
+TLE_STALE_AFTER_HOURS = 12
+
+def _compute_summary():
     db: Session = SessionLocal()
     try:
         total_satellites = db.query(func.count(Satellite.id)).scalar()
         total_debris = db.query(func.count(Satellite.id)).filter(Satellite.object_type == "DEBRIS").scalar()
         total_cdm = db.query(func.count(CDM.id)).scalar()
         total_alerts = db.query(func.count(CollisionAlert.id)).scalar()
-        last_tle_fetch = db.query(TLEMetadata).order_by(TLEMetadata.last_fetched_at.desc()).first()
-        last_fetch_time = last_tle_fetch.last_fetched_at if last_tle_fetch else None
-        summary = build_system_summary(total_satellites, total_debris, total_cdm, last_fetch_time, total_alerts)
+        last_fetch_time = db.query(func.max(TLEMetadata.last_fetched_at)).scalar()
+        return build_system_summary(total_satellites, total_debris, total_cdm, last_fetch_time, total_alerts)
+    finally:
+        db.close()
+
+
+@router.get("/summary", response_model=SummarySchema)
+def get_summary():
+    """Obtiene resumen general del sistema (cacheado; se recalcula tras cada ingesta de TLEs, CDMs o alertas)"""
+    try:
         return {
             "status": "success",
-            "data": summary
+            "data": stats_cache.get("summary", _compute_summary)
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error obteniendo resumen: {str(e)}")
+
+
+@router.get("/ready", response_model=ReadinessSchema, responses={503: {"model": ReadinessSchema}})
+def get_readiness():
+    """Preparación del servicio: catálogo disponible, antigüedad de los datos y progreso de la actualización"""
+    db: Session = SessionLocal()
+    try:
+        catalog_size = db.query(func.count(Satellite.id)).scalar()
+        last_tle_fetch = db.query(TLEMetadata).order_by(TLEMetadata.last_fetched_at.desc()).first()
+        last_fetch_time = last_tle_fetch.last_fetched_at if last_tle_fetch else None
+        age_hours = (datetime.utcnow() - last_fetch_time).total_seconds() / 3600 if last_fetch_time else None
+        sources = [
+            {
+                "source": state.source,
+                "last_checked_at": state.last_checked_at,
+                "last_changed_at": state.last_changed_at,
+                "row_count": state.row_count,
+            }
+            for state in db.query(TLESourceState).order_by(TLESourceState.source).all()
+        ]
+        # Se sirve con los datos existentes; solo se espera a la primera carga si la base está vacía
+        ready = catalog_size > 0
+        body = {
+            "status": "success",
+            "ready": ready,
+            "data": {
+                "catalog_size": catalog_size,
+                "last_tle_fetch_time": last_fetch_time,
+                "data_age_hours": round(age_hours, 2) if age_hours is not None else None,
+                "stale": age_hours is None or age_hours > TLE_STALE_AFTER_HOURS,
+                "sources": sources,
+                "refresh": get_refresh_state(),
+                "alert_queue": alert_queue.get_stats(),
+            },
+        }
+        return JSONResponse(content=jsonable_encoder(body), status_code=200 if ready else 503)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error obteniendo estado de preparación: {str(e)}")
     finally:
         db.close()
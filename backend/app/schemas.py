@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Optional, Dict
+from typing import Any, List, Optional, Dict
 from datetime import datetime
 
 class CollisionAlertSchema(BaseModel):
@@ -33,6 +33,16 @@ class SatelliteListSchema(BaseModel):
     data: List[SatelliteSchema]
     count: int
 
+class SatelliteSearchResultSchema(BaseModel):
+    norad_id: int
+    name: str
+    object_type: Optional[str]
+
+class SatelliteSearchSchema(BaseModel):
+    status: str
+    data: List[SatelliteSearchResultSchema]
+    count: int
+
 class SatelliteDetailSchema(BaseModel):
     status: str
     data: SatelliteSchema
@@ -40,6 +50,7 @@ class SatelliteDetailSchema(BaseModel):
 class SatelliteStatsDataSchema(BaseModel):
     total: int
     by_type: Dict[str, int]
+    by_altitude_band: Optional[Dict[str, int]] = None
 
 class SatelliteStatsSchema(BaseModel):
     status: str
@@ -56,6 +67,7 @@ class CDMSchema(BaseModel):
     tca: datetime
     min_rng: Optional[float]
     pc: Optional[float]
+    pc_method: Optional[str] = None
     sat_1_id: str
     sat_1_name: str
     sat1_object_type: Optional[str]
@@ -72,6 +84,16 @@ class CDMListSchema(BaseModel):
     data: List[CDMSchema]
     count: int
 
+class CDMPageSchema(BaseModel):
+    status: str
+    data: List[Dict[str, Any]]
+    count: int
+    next_cursor: Optional[str] = None
+
+class CDMIngestSchema(BaseModel):
+    status: str
+    data: Dict[str, int | float | None]
+
 class CollisionAlertListSchema(BaseModel):
     status: str
     data: List[CollisionAlertSchema]
@@ -81,5 +103,23 @@ class SummarySchema(BaseModel):
     status: str
     data: Dict[str, int | str | None | datetime]
 
+class CollisionAlertPageSchema(BaseModel):
+    status: str
+    data: List[Dict[str, Any]]
+    count: int
+    next_cursor: Optional[str] = None
+
+class ReadinessSchema(BaseModel):
+    status: str
+    ready: bool
+    data: Dict[str, Any]
+
+class OrbitBatchRequestSchema(BaseModel):
+    norad_ids: Optional[List[int]] = None
+    object_type: Optional[str] = None
+    source: Optional[str] = None
+    duration_hours: float = 24
+    interval_minutes: float = 10
+
 class MessageSchema(BaseModel):
     message: str
@@ -1,20 +1,64 @@
 # app/tle_fetcher.py
+import asyncio
+import os
+import threading
+import time
 from datetime import datetime, timedelta
 
-import requests
+import httpx
+from sqlalchemy import update
 
 from app.database import SessionLocal
-from app.models import Satellite, TLEMetadata
+from app.models import Satellite, TLEMetadata, TLESourceState
+from app.utils.ephemeris_cache import ephemeris_cache, tle_hash
+from app.utils.position_snapshot import position_snapshot
+from app.utils.stats_cache import stats_cache
 
-CELESTRAK_URL = "https://celestrak.com/NORAD/elements/gp.php?GROUP=active&FORMAT=tle"
+# Se puede apuntar a un servidor local (mirror o pruebas) con CELESTRAK_BASE_URL
+CELESTRAK_BASE_URL = os.getenv("CELESTRAK_BASE_URL", "https://celestrak.org").rstrip("/")
+TLE_FETCH_TIMEOUT_S = float(os.getenv("TLE_FETCH_TIMEOUT_S", "30"))
+TLE_FETCH_RETRIES = int(os.getenv("TLE_FETCH_RETRIES", "3"))
+TLE_FETCH_BACKOFF_S = 1.0
+
+
+def celestrak_group_url(group):
+    return f"{CELESTRAK_BASE_URL}/NORAD/elements/gp.php?GROUP={group}&FORMAT=tle"
+
+
+CELESTRAK_URL = celestrak_group_url("active")
 
 DEBRIS_SOURCES = [
-    ("cosmos-1408-debris", "https://celestrak.org/NORAD/elements/gp.php?GROUP=cosmos-1408-debris&FORMAT=tle"),
-    ("fengyun-1c-debris", "https://celestrak.org/NORAD/elements/gp.php?GROUP=fengyun-1c-debris&FORMAT=tle"),
-    ("iridium-33-debris", "https://celestrak.org/NORAD/elements/gp.php?GROUP=iridium-33-debris&FORMAT=tle"),
-    ("cosmos-2251-debris", "https://celestrak.org/NORAD/elements/gp.php?GROUP=cosmos-2251-debris&FORMAT=tle"),
+    (group, celestrak_group_url(group))
+    for group in ("cosmos-1408-debris", "fengyun-1c-debris", "iridium-33-debris", "cosmos-2251-debris")
 ]
 
+# Grupo de debris -> origen guardado en satellites.origin (p. ej. "cosmos-1408-debris" -> "cosmos_1408")
+DEBRIS_ORIGINS = {group: group.removesuffix("-debris").replace("-", "_") for group, _ in DEBRIS_SOURCES}
+
+# (fuente, url, object_type forzado); las últimas tienen prioridad si un NORAD ID aparece en varias
+TLE_SOURCES = [("CelesTrak", CELESTRAK_URL, None)] + [(name, url, "DEBRIS") for name, url in DEBRIS_SOURCES]
+
+# Progreso de la actualización en curso (o de la última), expuesto en /api/ready
+_refresh_lock = threading.Lock()
+refresh_state = {
+    "running": False,
+    "phase": "idle",
+    "groups_total": 0,
+    "groups_done": 0,
+    "started_at": None,
+    "finished_at": None,
+    "last_result": None,
+    "last_error": None,
+}
+
+
+def get_refresh_state():
+    return dict(refresh_state)
+
+
+def _group_done(result):
+    refresh_state["groups_done"] += 1
+
 
 def extract_norad_id(tle_line1: str) -> int:
     return int(tle_line1[2:7].strip())
@@ -32,7 +76,188 @@ def detect_object_type(name: str) -> str:
     return "PAYLOAD"  # Valor por defecto
 
 
-def fetch_and_store_tles():
+def detect_debris_origin(name: str) -> str:
+    """Origen de un debris que no viene de un grupo de DEBRIS_SOURCES, deducido del nombre ("other" si no se reconoce)."""
+    name_upper = name.upper().replace("-", " ")
+    for origin in DEBRIS_ORIGINS.values():
+        if origin.upper().replace("_", " ") in name_upper:
+            return origin
+    return "other"
+
+
+async def _download_group(client, source, url, state):
+    """
+    Descarga un grupo con petición condicional (If-None-Match / If-Modified-Since).
+    Reintenta con backoff exponencial ante timeouts, errores de red, 429 y 5xx.
+    """
+    headers = {}
+    if state and state.get("etag"):
+        headers["If-None-Match"] = state["etag"]
+    if state and state.get("last_modified"):
+        headers["If-Modified-Since"] = state["last_modified"]
+
+    result = {"source": source, "url": url, "status": "failed", "text": None, "etag": None, "last_modified": None}
+    for attempt in range(TLE_FETCH_RETRIES + 1):
+        if attempt:
+            await asyncio.sleep(TLE_FETCH_BACKOFF_S * 2 ** (attempt - 1))
+        try:
+            response = await client.get(url, headers=headers)
+        except httpx.TransportError as e:
+            result["error"] = f"{type(e).__name__}: {e}"
+            continue
+        if response.status_code == 304:
+            result["status"] = "not_modified"
+            return result
+        if response.status_code == 429 or response.status_code >= 500:
+            result["error"] = f"HTTP {response.status_code}"
+            continue
+        if response.status_code != 200:
+            result["error"] = f"HTTP {response.status_code}"
+            return result
+        result.update(
+            status="modified",
+            text=response.text,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+        )
+        return result
+    return result
+
+
+async def download_groups(sources, states=None, timeout_s=TLE_FETCH_TIMEOUT_S, on_done=None):
+    """
+    Descarga todos los grupos a la vez con un único cliente (pool de conexiones compartido).
+    on_done(resultado) se llama al terminar cada grupo, para informar del progreso.
+    """
+    states = states or {}
+
+    async def _tracked(client, source, url):
+        result = await _download_group(client, source, url, states.get(source))
+        if on_done:
+            on_done(result)
+        return result
+
+    async with httpx.AsyncClient(timeout=timeout_s, follow_redirects=True) as client:
+        return await asyncio.gather(*(_tracked(client, source, url) for source, url, _ in sources))
+
+
+# Filas por llamada al upsert: sin RETURNING, SQLAlchemy la ejecuta como executemany del driver (la misma
+# sentencia INSERT ... ON CONFLICT preparada una vez y repetida por fila), no como un VALUES multi-fila
+UPSERT_BATCH_SIZE = 5000
+
+SATELLITE_FIELDS = ("name", "tle_line1", "tle_line2", "source", "object_type", "origin")
+
+
+def parse_tle_text(text, source, object_type=None):
+    """Convierte un fichero de tripletas (nombre, línea 1, línea 2) en filas para la tabla satellites."""
+    lines = [line.strip() for line in text.strip().split("\n") if line.strip()]
+    rows = []
+    for i in range(0, len(lines) - 2, 3):
+        try:
+            name, tle1, tle2 = lines[i], lines[i + 1], lines[i + 2]
+            row_type = object_type or detect_object_type(name)
+            rows.append(
+                {
+                    "norad_id": extract_norad_id(tle1),
+                    "name": name,
+                    "tle_line1": tle1,
+                    "tle_line2": tle2,
+                    "source": source,
+                    "object_type": row_type,
+                    "origin": DEBRIS_ORIGINS.get(source) or (detect_debris_origin(name) if row_type == "DEBRIS" else None),
+                }
+            )
+        except Exception as e:
+            print(f"Error parsing TLE from {source}: {e}")
+    return rows
+
+
+def _upsert_statement(db):
+    """INSERT ... ON CONFLICT (norad_id) DO UPDATE del dialecto en uso (PostgreSQL o SQLite)."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"Bulk upsert not supported for dialect {dialect}")
+
+    stmt = insert(Satellite)
+    # onupdate de updated_at no se aplica en ON CONFLICT: se envía explícitamente en cada fila
+    return stmt.on_conflict_do_update(
+        index_elements=[Satellite.norad_id],
+        set_={field: stmt.excluded[field] for field in SATELLITE_FIELDS + ("updated_at",)},
+    )
+
+
+def upsert_satellites(db, rows, now=None, keep_sources=()):
+    """
+    Aplica las filas parseadas en bloque: una consulta para leer el estado actual, clasificación
+    en insertadas/actualizadas/sin cambios y upsert por lotes solo de las que cambian.
+    Las filas guardadas desde una fuente de keep_sources (grupos no descargados por 304) no se pisan.
+    Devuelve (conteos, timings) e invalida las efemérides de los TLEs que han cambiado.
+    """
+    now = now or datetime.now()
+    timings = {}
+
+    started = time.perf_counter()
+    existing = {
+        norad_id: values
+        for norad_id, *values in db.query(Satellite.norad_id, *(getattr(Satellite, f) for f in SATELLITE_FIELDS))
+    }
+    timings["diff_query_s"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    changed = []
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0}
+    for row in rows:
+        current = existing.get(row["norad_id"])
+        if current is not None and current[3] in keep_sources and current[3] != row["source"]:
+            counts["unchanged"] += 1
+        elif current is None:
+            counts["inserted"] += 1
+            changed.append({**row, "created_at": now, "updated_at": now})
+        elif tuple(current) != tuple(row[f] for f in SATELLITE_FIELDS):
+            counts["updated"] += 1
+            changed.append({**row, "created_at": now, "updated_at": now})
+            if (current[1], current[2]) != (row["tle_line1"], row["tle_line2"]):
+                ephemeris_cache.invalidate(row["norad_id"], keep_hash=tle_hash(row["tle_line1"], row["tle_line2"]))
+        else:
+            counts["unchanged"] += 1
+    timings["classify_s"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    if changed:
+        # created_at solo se usa al insertar: no forma parte del SET del ON CONFLICT
+        stmt = _upsert_statement(db)
+        for b0 in range(0, len(changed), UPSERT_BATCH_SIZE):
+            db.execute(stmt, changed[b0 : b0 + UPSERT_BATCH_SIZE])
+    timings["upsert_s"] = time.perf_counter() - started
+    return counts, timings
+
+
+def fetch_and_store_tles(sources=None):
+    """
+    Actualiza el catálogo de TLEs. Se ejecuta en segundo plano (scheduler); si ya hay una
+    actualización en curso no se lanza otra. El progreso queda en refresh_state.
+    """
+    if not _refresh_lock.acquire(blocking=False):
+        print("⏳ Skipping TLE fetch – a refresh is already running.")
+        return
+    refresh_state.update(running=True, phase="starting", groups_done=0, started_at=datetime.utcnow(), last_error=None)
+    try:
+        result = _fetch_and_store_tles(sources or TLE_SOURCES)
+        refresh_state["last_result"] = result or {"skipped": True}
+        return result
+    except Exception as e:
+        refresh_state["last_error"] = str(e)
+        raise
+    finally:
+        refresh_state.update(running=False, phase="idle", finished_at=datetime.utcnow())
+        _refresh_lock.release()
+
+
+def _fetch_and_store_tles(sources):
     db = SessionLocal()
     try:
         # ✅ Step 1: Check last fetched time
@@ -43,84 +268,112 @@ def fetch_and_store_tles():
             print("⏳ Skipping TLE fetch – already fetched within last 6 hours.")
             return
 
-        # ✅ Step 2: Fetch from CelesTrak (active satellites)
-        print("📡 Fetching TLEs from CelesTrak (active satellites)...")
-        response = requests.get(CELESTRAK_URL)
-        data = response.text.strip().split("\n")
-
-        count = 0
-        for i in range(0, len(data), 3):
-            try:
-                name = data[i].strip()
-                tle1 = data[i + 1].strip()
-                tle2 = data[i + 2].strip()
-                norad_id = extract_norad_id(tle1)
-
-                sat = db.query(Satellite).filter(Satellite.norad_id == norad_id).first()
-
-                object_type = detect_object_type(name)
-                if sat:
-                    sat.name = name
-                    sat.tle_line1 = tle1
-                    sat.tle_line2 = tle2
-                    sat.source = "CelesTrak"
-                    sat.object_type = object_type
-                else:
-                    sat = Satellite(
-                        norad_id=norad_id,
-                        name=name,
-                        tle_line1=tle1,
-                        tle_line2=tle2,
-                        source="CelesTrak",
-                        object_type=object_type,
-                    )
-                    db.add(sat)
-                count += 1
-            except Exception as e:
-                print(f"Error parsing TLE: {e}")
-
-        # ✅ Step 3: Fetch debris from specific sources
-        for debris_name, debris_url in DEBRIS_SOURCES:
-            print(f"📡 Fetching debris TLEs from {debris_name}...")
-            try:
-                debris_response = requests.get(debris_url)
-                debris_data = debris_response.text.strip().split("\n")
-                for i in range(0, len(debris_data), 3):
-                    try:
-                        name = debris_data[i].strip()
-                        tle1 = debris_data[i + 1].strip()
-                        tle2 = debris_data[i + 2].strip()
-                        norad_id = extract_norad_id(tle1)
-                        sat = db.query(Satellite).filter(Satellite.norad_id == norad_id).first()
-                        object_type = "DEBRIS"
-                        if sat:
-                            sat.name = name
-                            sat.tle_line1 = tle1
-                            sat.tle_line2 = tle2
-                            sat.source = debris_name
-                            sat.object_type = object_type
-                        else:
-                            sat = Satellite(
-                                norad_id=norad_id,
-                                name=name,
-                                tle_line1=tle1,
-                                tle_line2=tle2,
-                                source=debris_name,
-                                object_type=object_type,
-                            )
-                            db.add(sat)
-                    except Exception as e:
-                        print(f"Error parsing debris TLE from {debris_name}: {e}")
-            except Exception as e:
-                print(f"Error fetching debris from {debris_name}: {e}")
-
-        # ✅ Step 4: Update metadata
-        if not meta:
-            meta = TLEMetadata(last_fetched_at=now)
-            db.add(meta)
-        else:
-            meta.last_fetched_at = now
+        # ✅ Step 2: Download every group concurrently (conditional requests)
+        refresh_state.update(phase="downloading", groups_total=len(sources))
+        started = time.perf_counter()
+        print(f"📡 Fetching {len(sources)} TLE groups from CelesTrak...")
+        states = {
+            state.source: {"etag": state.etag, "last_modified": state.last_modified}
+            for state in db.query(TLESourceState).all()
+        }
+        results = asyncio.run(download_groups(sources, states, on_done=_group_done))
+        download_s = time.perf_counter() - started
+
+        # ✅ Step 3: Parse every triplet; later groups override earlier ones for the same NORAD ID
+        refresh_state["phase"] = "parsing"
+        started = time.perf_counter()
+        rows = {}
+        row_counts = {}
+        for (source, _, object_type), result in zip(sources, results):
+            if result["status"] == "modified":
+                parsed = parse_tle_text(result["text"], source, object_type)
+                row_counts[source] = len(parsed)
+                for row in parsed:
+                    rows[row["norad_id"]] = row
+                print(f"📥 {source}: {len(parsed)} TLEs downloaded.")
+            elif result["status"] == "not_modified":
+                print(f"⏭️ {source}: not modified since last fetch.")
+            else:
+                print(f"Error fetching TLEs from {source}: {result.get('error')}")
+        parse_s = time.perf_counter() - started
+
+        # ✅ Step 4: Bulk upsert, per-source state and metadata in a single short transaction
+        refresh_state["phase"] = "storing"
+        skipped = {result["source"] for result in results if result["status"] != "modified"}
+        counts, timings = upsert_satellites(db, list(rows.values()), keep_sources=skipped)
+
+        existing_states = {state.source: state for state in db.query(TLESourceState).all()}
+        for result in results:
+            if result["status"] == "failed":
+                continue
+            state = existing_states.get(result["source"])
+            if not state:
+                state = TLESourceState(source=result["source"], url=result["url"])
+                db.add(state)
+            state.url = result["url"]
+            state.last_checked_at = now
+            if result["status"] == "modified":
+                state.etag = result["etag"]
+                state.last_modified = result["last_modified"]
+                state.last_changed_at = now
+                state.row_count = row_counts[result["source"]]
+
+        # Si falla el catálogo activo se vuelve a intentar en la próxima ejecución
+        if results[0]["status"] != "failed":
+            if not meta:
+                meta = TLEMetadata(last_fetched_at=now)
+                db.add(meta)
+            else:
+                meta.last_fetched_at = now
+        started = time.perf_counter()
+        db.commit()
+        timings["commit_s"] = time.perf_counter() - started
+        ephemeris_cache.prune()
+        stats_cache.invalidate()
+        position_snapshot.invalidate_catalog()
+
+        timings = {"download_s": download_s, "parse_s": parse_s, **timings}
+        print(
+            f"✅ Stored {len(rows)} TLEs: {counts['inserted']} inserted, {counts['updated']} updated, "
+            f"{counts['unchanged']} unchanged."
+        )
+        print("⏱️ TLE ingest phases: " + ", ".join(f"{k[:-2]} {v:.2f}s" for k, v in timings.items()))
+        return {
+            "rows": len(rows),
+            **counts,
+            "sources": {result["source"]: result["status"] for result in results},
+            "timings": timings,
+        }
+    finally:
+        db.close()
+
+
+def backfill_debris_origin():
+    """Rellena satellites.origin en los debris guardados antes de existir la columna (solo las filas vacías)."""
+    db = SessionLocal()
+    try:
+        pending = (
+            db.query(Satellite.id, Satellite.name, Satellite.source, Satellite.updated_at)
+            .filter(Satellite.object_type == "DEBRIS", Satellite.origin.is_(None))
+            .all()
+        )
+        if not pending:
+            return 0
+        # updated_at se reenvía tal cual: rellenar el origen no es un cambio del TLE
+        db.execute(
+            update(Satellite),
+            [
+                {
+                    "id": sat_id,
+                    "origin": DEBRIS_ORIGINS.get(source) or detect_debris_origin(name or ""),
+                    "updated_at": updated_at,
+                }
+                for sat_id, name, source, updated_at in pending
+            ],
+        )
         db.commit()
-        print(f"✅ Fetched and stored {count} active satellites and debris TLEs.")
+        stats_cache.invalidate()
+        print(f"🏷️ Debris origin backfilled for {len(pending)} objects.")
+        return len(pending)
     finally:
         db.close()
@@ -0,0 +1,42 @@
+import asyncio
+import threading
+
+
+class AlertBroadcaster:
+    """
+    Aviso de alertas nuevas a los clientes del stream SSE. Quien escribe alertas (hilos del worker,
+    del scheduler o tareas en segundo plano) llama a notify() tras confirmar; cada suscriptor es un
+    asyncio.Event de su bucle que se despierta con call_soon_threadsafe y vuelve a leer la base desde
+    su cursor. No se guardan alertas en memoria: la base de datos es la fuente de verdad.
+    """
+
+    def __init__(self):
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self):
+        subscriber = (asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def notify(self, *_):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for loop, event in subscribers:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # Bucle ya cerrado: el suscriptor se elimina al salir de su generador
+                pass
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+
+alert_broadcaster = AlertBroadcaster()
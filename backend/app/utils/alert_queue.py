@@ -0,0 +1,134 @@
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+from app.database import SessionLocal
+from app.utils.alert_broadcaster import alert_broadcaster
+from app.utils.collision_scheduler import create_alerts_for_cdms
+from app.utils.stats_cache import stats_cache
+
+# Lotes de CDM IDs pendientes como máximo; si se llena, la ingesta espera (backpressure)
+ALERT_QUEUE_MAXSIZE = int(os.getenv("ALERT_QUEUE_MAXSIZE", "64"))
+# Espera máxima de la ingesta con la cola llena antes de descartar el lote (lo recoge el barrido periódico)
+ALERT_QUEUE_PUT_TIMEOUT_S = 30.0
+# El worker agrupa lo que llegue en esta ventana, hasta ALERT_BATCH_MAX_IDS IDs por transacción
+ALERT_BATCH_LINGER_S = 0.2
+ALERT_BATCH_MAX_IDS = 20000
+
+_STOP = object()
+
+
+class AlertQueue:
+    """
+    Cola en proceso de CDMs pendientes de evaluar. La ingesta encola los IDs nuevos tras confirmar
+    cada bloque y un hilo worker crea las alertas en lotes, de modo que una conjunción de riesgo
+    aparece en /api/collision-alerts segundos después de llegar.
+    """
+
+    def __init__(self, maxsize=ALERT_QUEUE_MAXSIZE):
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._listeners = [alert_broadcaster.notify, stats_cache.invalidate]
+        self.stats = {
+            "queued_ids": 0,
+            "processed_ids": 0,
+            "alerts_created": 0,
+            "batches": 0,
+            "dropped_ids": 0,
+            "errors": 0,
+            "last_batch_at": None,
+        }
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="alert-queue", daemon=True)
+                self._thread.start()
+
+    def submit(self, cdm_ids):
+        """Encola IDs de CDMs ya confirmados. Bloquea si la cola está llena; devuelve False si se descartan."""
+        cdm_ids = list(cdm_ids)
+        if not cdm_ids:
+            return True
+        self.start()
+        try:
+            self._queue.put(cdm_ids, timeout=ALERT_QUEUE_PUT_TIMEOUT_S)
+        except queue.Full:
+            self.stats["dropped_ids"] += len(cdm_ids)
+            print(f"⚠️ Alert queue full: {len(cdm_ids)} CDMs left for the periodic reconciliation scan.")
+            return False
+        self.stats["queued_ids"] += len(cdm_ids)
+        return True
+
+    def flush(self):
+        """Espera a que se procese todo lo encolado."""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.join()
+
+    def stop(self):
+        """Procesa lo pendiente y para el worker."""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+
+    def add_listener(self, callback):
+        """callback(n_alertas) se llama tras cada lote que crea alertas nuevas."""
+        self._listeners.append(callback)
+
+    def get_stats(self):
+        return {**self.stats, "pending_batches": self._queue.qsize()}
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                self._queue.task_done()
+                break
+            cdm_ids, taken = list(item), 1
+            deadline = time.monotonic() + ALERT_BATCH_LINGER_S
+            while len(cdm_ids) < ALERT_BATCH_MAX_IDS:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                taken += 1
+                if item is _STOP:
+                    stopping = True
+                    break
+                cdm_ids.extend(item)
+            try:
+                self._process(cdm_ids)
+            finally:
+                for _ in range(taken):
+                    self._queue.task_done()
+
+    def _process(self, cdm_ids):
+        db = SessionLocal()
+        try:
+            created = create_alerts_for_cdms(db, cdm_ids)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            self.stats["errors"] += 1
+            print(f"Error evaluating alerts for {len(cdm_ids)} CDMs: {e}")
+            return
+        finally:
+            db.close()
+        self.stats["processed_ids"] += len(cdm_ids)
+        self.stats["alerts_created"] += created
+        self.stats["batches"] += 1
+        self.stats["last_batch_at"] = datetime.utcnow()
+        if created:
+            print(f"🚨 {created} new alerts from {len(cdm_ids)} CDMs.")
+            for callback in self._listeners:
+                try:
+                    callback(created)
+                except Exception as e:
+                    print(f"Error notifying alert listener: {e}")
+
+
+alert_queue = AlertQueue()
@@ -0,0 +1,243 @@
+"""
+Probabilidad de colisión (Pc) vectorizada con NumPy para miles de encuentros a la vez.
+
+Pc 2D en el plano del encuentro (Foster): integral de la gaussiana de la posición relativa sobre el
+círculo del radio de objeto duro (HBR), con la distancia de fallo sobre el eje x. La integral se
+resuelve con cuadratura de Gauss-Legendre en el ángulo, sin bucles por encuentro.
+
+Los CDMs públicos y el cribado interno no traen covarianza, así que para ellos se usa el Pc máximo:
+el de la covarianza de forma fija (isótropa por defecto) cuyo tamaño maximiza Pc para esa distancia y
+ese HBR. No es una cota para cualquier covarianza: con covarianzas alargadas el Pc real puede ser mayor
+(en el CSV de ejemplo el PC publicado es de mediana ~2.5 veces el estimado isótropo).
+
+Uso: python -m app.utils.collision_probability [--backfill] [--bench N]
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+from sqlalchemy import bindparam, select, update
+
+from app.database import SessionLocal
+from app.models import CDM
+from app.utils.stats_cache import stats_cache
+
+# Radio (m) por objeto según la clase RCS del CDM cuando no hay volumen de exclusión
+# (coincide con los volúmenes de exclusión más habituales para cada clase en los datos)
+RCS_RADIUS_M = {"SMALL": 1.0, "MEDIUM": 3.0, "LARGE": 5.0}
+# Radio (m) de un objeto sin volumen de exclusión ni RCS (p. ej. objetos del catálogo TLE)
+DEFAULT_OBJECT_RADIUS_M = 5.0
+PC_MAX_METHOD = "max_pc"
+# Relación entre ejes de la covarianza supuesta en el Pc máximo (1 = isótropa; el eje corto, perpendicular
+# a la distancia de fallo, es el que hace crecer Pc: con HBR << distancia Pc escala linealmente con ella)
+PC_MAX_ASPECT_RATIO = float(os.getenv("PC_MAX_ASPECT_RATIO", "1"))
+# Nodos de la cuadratura en el ángulo (integrando suave: 16 nodos bastan)
+PC_QUADRATURE_NODES = 16
+# CDMs por lote al rellenar Pc en la base
+PC_BACKFILL_BATCH = 5000
+
+# Encuentros por bloque de la cuadratura
+PC_BLOCK_ROWS = 8192
+
+_theta, _weights = np.polynomial.legendre.leggauss(PC_QUADRATURE_NODES)
+_sin_theta, _cos_theta = np.sin(_theta * np.pi / 2), np.cos(_theta * np.pi / 2)
+_weights = _weights * (np.pi / 2)
+
+# Coeficientes de Abramowitz-Stegun 7.1.26 (error absoluto < 1.5e-7)
+_ERF_P = 0.3275911
+_ERF_A = (0.254829592, -0.284496736, 1.421413741, -1.453152027, 1.061405429)
+# Serie de Taylor de erf hasta x⁹ (error relativo < 1e-6 para |x| < 0.5)
+_ERF_SERIES = tuple(2.0 / np.sqrt(np.pi) * c for c in (1.0, -1 / 3, 1 / 10, -1 / 42, 1 / 216))
+
+
+def erf(x):
+    """
+    erf vectorizada: serie de Taylor cerca de 0 (precisión relativa para Pc pequeños) y A&S 7.1.26 fuera.
+    La rama exponencial solo se evalúa donde hace falta (en el Pc máximo la semicuerda suele ser << sigma).
+    """
+    x = np.asarray(x, dtype=np.float64)
+    a = np.abs(np.atleast_1d(x))
+    a2 = a * a
+    out = a * (_ERF_SERIES[0] + a2 * (_ERF_SERIES[1] + a2 * (_ERF_SERIES[2] + a2 * (_ERF_SERIES[3] + a2 * _ERF_SERIES[4]))))
+    far = a >= 0.5
+    if far.any():
+        af = a[far]
+        t = 1.0 / (1.0 + _ERF_P * af)
+        poly = t * (_ERF_A[0] + t * (_ERF_A[1] + t * (_ERF_A[2] + t * (_ERF_A[3] + t * _ERF_A[4]))))
+        out[far] = 1.0 - poly * np.exp(-af * af)
+    return np.copysign(out, x).reshape(x.shape)
+
+
+def _object_radius_m(excl_vol, rcs):
+    excl_vol = np.asarray(excl_vol, dtype=np.float64)
+    fallback = np.array([RCS_RADIUS_M.get(value, DEFAULT_OBJECT_RADIUS_M) for value in rcs], dtype=np.float64)
+    return np.where(np.isfinite(excl_vol) & (excl_vol > 0), excl_vol, fallback)
+
+
+def hard_body_radius_m(excl_vol_1, excl_vol_2, rcs_1, rcs_2):
+    """
+    HBR combinado (m) por encuentro: suma de los radios de ambos objetos. Cada radio es el volumen de
+    exclusión del CDM (m) y, si falta, el de su clase RCS. Los valores ausentes llegan como NaN/None.
+    """
+    return _object_radius_m(excl_vol_1, rcs_1) + _object_radius_m(excl_vol_2, rcs_2)
+
+
+def pc_circle(miss_m, hbr_m, sigma_x_m, sigma_z_m):
+    """
+    Pc 2D de N encuentros: distancia de fallo sobre el eje x del plano del encuentro y covarianza
+    combinada diagonal (sigma_x en la dirección de la distancia, sigma_z en la perpendicular).
+    Con x = HBR·sin θ la semicuerda es HBR·cos θ y el integrando es suave en θ ∈ [-π/2, π/2].
+    Se evalúa por bloques de PC_BLOCK_ROWS encuentros para que los temporales (N × nodos) quepan en caché.
+    """
+    miss, hbr, sx, sz = np.broadcast_arrays(*(np.asarray(v, dtype=np.float64) for v in (miss_m, hbr_m, sigma_x_m, sigma_z_m)))
+    pc = np.empty(miss.shape)
+    for i in range(0, len(pc), PC_BLOCK_ROWS):
+        block = slice(i, i + PC_BLOCK_ROWS)
+        pc[block] = _pc_circle_block(miss[block], hbr[block], sx[block], sz[block])
+    return pc
+
+
+def _pc_circle_block(miss, hbr, sx, sz):
+    miss, hbr, sx, sz = miss[:, None], hbr[:, None], sx[:, None], sz[:, None]
+    u = (hbr * _sin_theta - miss) / sx
+    density = np.exp(-0.5 * u * u) / (np.sqrt(2 * np.pi) * sx)
+    chord = erf(hbr * _cos_theta / (np.sqrt(2.0) * sz))
+    return np.clip((density * chord * hbr * _cos_theta) @ _weights, 0.0, 1.0)
+
+
+def max_pc(miss_m, hbr_m, aspect_ratio=PC_MAX_ASPECT_RATIO):
+    """
+    Pc máximo sin covarianza: sigma_x = distancia/√2 y sigma_z = sigma_x/aspect_ratio, el tamaño que
+    maximiza Pc (≈ aspect_ratio·HBR²/(e·distancia²) cuando HBR << distancia). Si la distancia no supera
+    el HBR, Pc = 1. Distancias ausentes (NaN) dan NaN.
+    """
+    miss = np.asarray(miss_m, dtype=np.float64)
+    hbr = np.broadcast_to(np.asarray(hbr_m, dtype=np.float64), miss.shape)
+    pc = np.full(miss.shape, np.nan)
+    inside = miss <= hbr
+    pc[inside] = 1.0
+    outside = np.flatnonzero(miss > hbr)
+    if len(outside):
+        sigma = miss[outside] / np.sqrt(2.0)
+        pc[outside] = pc_circle(miss[outside], hbr[outside], sigma, sigma / aspect_ratio)
+    return pc
+
+
+def max_pc_km(distance_km, hbr_m=2 * DEFAULT_OBJECT_RADIUS_M):
+    """Pc máximo para distancias del cribado (km), con el HBR por defecto del catálogo TLE."""
+    return max_pc(np.asarray(distance_km, dtype=np.float64) * 1000.0, hbr_m)
+
+
+def cdm_max_pc(rows):
+    """Pc máximo de dicts de CDM (min_rng en km, volúmenes de exclusión y RCS de ambos objetos)."""
+    def column(name):
+        return [row[name] for row in rows]
+
+    def floats(name):
+        return np.array([np.nan if v is None else v for v in column(name)], dtype=np.float64)
+
+    hbr = hard_body_radius_m(
+        floats("sat_1_excl_vol"), floats("sat_2_excl_vol"), column("sat1_rcs"), column("sat2_rcs")
+    )
+    return max_pc(floats("min_rng") * 1000.0, hbr)
+
+
+def fill_missing_pc(rows):
+    """Completa en sitio pc/pc_method de los dicts de CDM sin PC (lo usa la ingesta antes de insertar)."""
+    missing = [row for row in rows if row.get("pc") is None and row.get("min_rng") is not None]
+    if not missing:
+        return 0
+    filled = 0
+    for row, pc in zip(missing, cdm_max_pc(missing)):
+        if np.isfinite(pc):
+            row["pc"] = float(pc)
+            row["pc_method"] = PC_MAX_METHOD
+            filled += 1
+    return filled
+
+
+def backfill_cdm_pc(batch=PC_BACKFILL_BATCH):
+    """
+    Rellena en bloque el PC estimado de los CDMs que no lo traen (pc_method = 'max_pc'), recorriendo
+    la tabla por id en lotes que se confirman por separado. Las filas sin estimación posible se quedan
+    con PC nulo. Las alertas no se tocan: los criterios de alerta solo usan el PC publicado.
+    """
+    table = CDM.__table__
+    stmt = update(table).where(table.c.id == bindparam("cdm_id")).values(pc=bindparam("pc_value"), pc_method=PC_MAX_METHOD)
+    pending = (
+        select(CDM.id, CDM.min_rng, CDM.sat_1_excl_vol, CDM.sat_2_excl_vol, CDM.sat1_rcs, CDM.sat2_rcs)
+        .where(CDM.pc.is_(None), CDM.min_rng.isnot(None))
+        .order_by(CDM.id)
+        .limit(batch)
+    )
+    db = SessionLocal()
+    try:
+        updated, last_id = 0, None
+        while True:
+            query = pending if last_id is None else pending.where(CDM.id > last_id)
+            rows = [row._asdict() for row in db.execute(query)]
+            if not rows:
+                break
+            last_id = rows[-1]["id"]
+            values = [
+                {"cdm_id": row["id"], "pc_value": float(pc)} for row, pc in zip(rows, cdm_max_pc(rows)) if np.isfinite(pc)
+            ]
+            if values:
+                db.execute(stmt, values)
+                db.commit()
+                updated += len(values)
+        if updated:
+            stats_cache.invalidate()
+            print(f"🎯 PC estimated for {updated} CDMs without PC.")
+        return updated
+    finally:
+        db.close()
+
+
+def benchmark(n=100_000, repeat=5, seed=0):
+    """Micro-benchmark: encuentros por segundo de max_pc y de pc_circle con covarianza anisótropa."""
+    rng = np.random.default_rng(seed)
+    miss = rng.uniform(10.0, 5000.0, n)
+    hbr = rng.choice([2.0, 6.0, 10.0], n)
+    sigma_x, sigma_z = rng.uniform(20.0, 2000.0, n), rng.uniform(20.0, 2000.0, n)
+    cases = {
+        "max_pc": lambda: max_pc(miss, hbr),
+        "pc_circle": lambda: pc_circle(miss, hbr, sigma_x, sigma_z),
+    }
+    results = {"encounters": n, "quadrature_nodes": PC_QUADRATURE_NODES}
+    for name, fn in cases.items():
+        fn()
+        best = min(_timed(fn) for _ in range(repeat))
+        results[name] = {"seconds": round(best, 4), "encounters_per_s": round(n / best)}
+    return results
+
+
+def _timed(fn):
+    started = time.perf_counter()
+    fn()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Probabilidad de colisión vectorizada")
+    parser.add_argument("--backfill", action="store_true", help="Rellenar el PC de los CDMs que no lo traen")
+    parser.add_argument("--bench", type=int, metavar="N", help="Micro-benchmark con N encuentros aleatorios")
+    args = parser.parse_args()
+
+    if args.bench:
+        results = benchmark(args.bench)
+        for name in ("max_pc", "pc_circle"):
+            r = results[name]
+            print(f"⏱️ {name}: {args.bench} encounters in {r['seconds']}s ({r['encounters_per_s']:,} encounters/s)")
+    if args.backfill:
+        from app import models
+        from app.database import engine
+        from app.utils.schema_sync import sync_schema
+
+        sync_schema(engine, models.Base.metadata)
+        backfill_cdm_pc()
+
+
+if __name__ == "__main__":
+    main()
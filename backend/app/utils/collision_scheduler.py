@@ -1,30 +1,114 @@
 from datetime import datetime, timedelta
+from sqlalchemy import and_, bindparam, case, exists, func, insert, or_, select
 from sqlalchemy.orm import Session
 from app.database import SessionLocal
-from app.models import CDM, CollisionAlert
+from app.models import CDM, AlertScanState, CollisionAlert
+from app.utils.alert_broadcaster import alert_broadcaster
+from app.utils.stats_cache import stats_cache
+
+# Criterios de riesgo: min_rng < 2km o PC > 1e-4 (solo el PC publicado; los estimados, pc_method no nulo, no cuentan)
+MIN_RNG_ALERT_KM = 2.0
+PC_ALERT_THRESHOLD = 1e-4
+# Niveles de riesgo: HIGH si PC > 1e-3 o min_rng < 0.5 km; MEDIUM si PC > 1e-4 o min_rng < 1 km; si no, LOW
+PC_HIGH = 1e-3
+MIN_RNG_HIGH_KM = 0.5
+MIN_RNG_MEDIUM_KM = 1.0
+# CDM IDs por consulta IN al evaluar un lote recién ingestado
+ALERT_ID_BATCH = 900
+# El barrido periódico vuelve a mirar este margen antes de la marca de agua (lotes confirmados tarde);
+# el anti-join evita duplicar alertas
+ALERT_WATERMARK_OVERLAP = timedelta(minutes=10)
+# Ventana de la primera pasada, cuando todavía no hay marca de agua
+ALERT_INITIAL_WINDOW = timedelta(hours=24)
+
+
+def _alert_insert(condition):
+    """
+    INSERT INTO collision_alerts ... SELECT ... FROM cdm en una sola sentencia: filtro de riesgo,
+    anti-join contra las alertas existentes y cálculo de risk_level/alert_reason en la misma pasada.
+    """
+    published = CDM.pc_method.is_(None)
+    pc_risky = and_(published, CDM.pc > PC_ALERT_THRESHOLD)
+    range_risky = CDM.min_rng < MIN_RNG_ALERT_KM
+    risk_level = case(
+        (or_(and_(published, CDM.pc > PC_HIGH), CDM.min_rng < MIN_RNG_HIGH_KM), "HIGH"),
+        (or_(pc_risky, CDM.min_rng < MIN_RNG_MEDIUM_KM), "MEDIUM"),
+        else_="LOW",
+    )
+    alert_reason = case(
+        (and_(pc_risky, range_risky), f"CDM: PC > {PC_ALERT_THRESHOLD:.0e} y distancia mínima < {MIN_RNG_ALERT_KM:g} km"),
+        (pc_risky, f"CDM: PC > {PC_ALERT_THRESHOLD:.0e}"),
+        else_=f"CDM: distancia mínima < {MIN_RNG_ALERT_KM:g} km",
+    )
+    already_alerted = exists().where(CollisionAlert.cdm_id == CDM.id)
+    rows = select(
+        CDM.id,
+        bindparam("created", type_=CollisionAlert.created.type),
+        CDM.tca,
+        CDM.min_rng,
+        case((published, CDM.pc), else_=None),
+        CDM.sat_1_id,
+        CDM.sat_1_name,
+        CDM.sat_2_id,
+        CDM.sat_2_name,
+        risk_level,
+        alert_reason,
+    ).where(condition, or_(pc_risky, range_risky), ~already_alerted)
+
+    table = CollisionAlert.__table__
+    columns = [
+        table.c.cdm_id, table.c.created, table.c.tca, table.c.min_rng, table.c.pc, table.c.sat_1_id,
+        table.c.sat_1_name, table.c.sat_2_id, table.c.sat_2_name, table.c.risk_level, table.c.alert_reason,
+    ]
+    return insert(table).from_select(columns, rows)
+
+
+def create_alerts_for_cdms(db: Session, cdm_ids):
+    """
+    Crea las alertas de los CDMs indicados (p. ej. los recién ingestados) que cumplen los criterios
+    de riesgo y todavía no tienen alerta. Una sentencia por lote de IDs; no confirma la transacción.
+    """
+    created = 0
+    now = datetime.utcnow()
+    cdm_ids = list(cdm_ids)
+    for i in range(0, len(cdm_ids), ALERT_ID_BATCH):
+        result = db.execute(_alert_insert(CDM.id.in_(cdm_ids[i : i + ALERT_ID_BATCH])), {"created": now})
+        created += result.rowcount
+    return created
+
 
 def scan_cdm_for_alerts():
-    """Escanea los CDM recientes y crea alertas de colisión si cumplen criterios de riesgo."""
+    """
+    Barrido incremental: evalúa solo los CDMs ingestados desde la última marca de agua
+    (CDM.ingested_at) y la avanza. Sirve de reconciliación para la evaluación que se hace al ingestar.
+    """
     db: Session = SessionLocal()
     try:
-        since = datetime.utcnow() - timedelta(hours=24)
-        cdms = db.query(CDM).filter(CDM.created >= since).all()
-        for cdm in cdms:
-            # Criterios de riesgo: min_rng < 2km o PC > 1e-4
-            if (cdm.min_rng is not None and float(cdm.min_rng) < 2.0) or \
-               (cdm.pc is not None and float(cdm.pc) > 1e-4):
-                exists = db.query(CollisionAlert).filter_by(cdm_id=cdm.id).first()
-                if not exists:
-                    alert = CollisionAlert(
-                        cdm_id=cdm.id,
-                        sat_1_id=cdm.sat_1_id,
-                        sat_2_id=cdm.sat_2_id,
-                        tca=cdm.tca,
-                        min_rng=cdm.min_rng,
-                        pc=cdm.pc,
-                        created=datetime.utcnow()
-                    )
-                    db.add(alert)
+        now = datetime.utcnow()
+        state = db.query(AlertScanState).first()
+        if not state:
+            state = AlertScanState()
+            db.add(state)
+        # La nueva marca de agua se fija antes de evaluar: lo que llegue mientras tanto entra en la siguiente pasada
+        high_water = db.query(func.max(CDM.ingested_at)).scalar()
+
+        if state.last_ingested_at:
+            condition = CDM.ingested_at >= state.last_ingested_at - ALERT_WATERMARK_OVERLAP
+        else:
+            # Primera pasada: CDMs de las últimas 24 h (incluye los anteriores a la columna ingested_at)
+            condition = or_(CDM.ingested_at >= now - ALERT_INITIAL_WINDOW, CDM.created >= now - ALERT_INITIAL_WINDOW)
+        if high_water:
+            condition = and_(condition, or_(CDM.ingested_at <= high_water, CDM.ingested_at.is_(None)))
+
+        created = db.execute(_alert_insert(condition), {"created": now}).rowcount
+        state.last_ingested_at = high_water or state.last_ingested_at
+        state.last_run_at = now
+        state.last_alerts_created = created
         db.commit()
+        if created:
+            alert_broadcaster.notify()
+            stats_cache.invalidate()
+        print(f"🚨 CDM alert scan: {created} new alerts (watermark {state.last_ingested_at}).")
+        return created
     finally:
         db.close()
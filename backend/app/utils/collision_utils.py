@@ -1,27 +1,143 @@
-from skyfield.api import EarthSatellite, load
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from app.catalog_propagator import propagate_catalog, propagate_positions, teme_to_geodetic
+from app.collision_detector import build_time_grid, get_timescale
+from app.utils.collision_probability import max_pc_km
+from app.utils.ephemeris_buffer import SharedEphemeris
+from app.utils.orbit_filters import DEFAULT_SHELL_PAD_KM, mean_elements, select_rows, shell_overlap_counts
+from app.utils.scan_executor import SCAN_EPHEMERIS_DTYPE, run_sharded_scan
+from app.utils.spatial_hash import default_screening_km
 
-ts = load.timescale()
 
 def get_altitude_km(tle1, tle2, name):
     """
     Calcula la altitud (en km) de un satélite a partir de sus líneas TLE y nombre.
     """
-    sat = EarthSatellite(tle1, tle2, name, ts)
-    return sat.at(ts.now()).subpoint().elevation.km
+    altitudes, _ = get_catalog_altitudes_km([(tle1, tle2)])
+    return altitudes[0]
+
+def get_catalog_altitudes_km(tle_pairs, when=None):
+    """
+    Altitud actual (km) de todo un catálogo en una sola propagación vectorizada.
+    Retorna (altitudes, errores); los objetos que sgp4 no puede propagar (p. ej. decaídos) quedan en NaN.
+    """
+    times = [when or datetime.now(timezone.utc)]
+    r, _, errors = propagate_catalog(tle_pairs, times)
+    _, _, alt = teme_to_geodetic(r, get_timescale().from_datetimes(times))
+    return alt[:, 0], errors
 
-def run_collision_scan_logic(satellites, debris_and_rocket, detect_close_approaches_func, threshold_km=5):
+def run_collision_scan_logic(
+    satellites,
+    debris_and_rocket,
+    threshold_km=5,
+    duration_hours=24,
+    interval_minutes=10,
+    start_time=None,
+    screening_km=None,
+    shell_pad_km=DEFAULT_SHELL_PAD_KM,
+    orbit_path_filter=False,
+    workers=None,
+    ephemeris_dtype=None,
+):
     """
     Lógica principal para escanear posibles colisiones entre satélites y objetos (debris/rocket bodies).
-    Retorna una lista de tuplas (sat_a, sat_b, time, distance_km).
+    Etapas: filtro de capas perigeo/apogeo (los objetos sin ningún solape no se propagan), propagación
+    única sobre la rejilla común, rejilla espacial por paso (volumen screening_km), filtro opcional de
+    línea de nodos y refinamiento del TCA alrededor de los mínimos de la rejilla gruesa. Las dos últimas
+    etapas se reparten por shards de primarias entre `workers` procesos (COLLISION_SCAN_WORKERS por defecto),
+    que leen las efemérides de memoria compartida; ephemeris_dtype=np.float32 (o COLLISION_SCAN_FLOAT32=1)
+    reduce su tamaño a la mitad.
+    Retorna (resultados, estadísticas); cada resultado es un encuentro (dict) con ambos objetos,
+    time (TCA), distance_km y relative_velocity_km_s.
     """
+    started = time.perf_counter()
+    n_primary = len(satellites)
+    objects = list(satellites) + list(debris_and_rocket)
+    pad_km = threshold_km + shell_pad_km
+    stages = []
+
+    def _stage(name, pairs_in, pairs_out):
+        stages.append({"stage": name, "pairs_in": int(pairs_in), "pairs_out": int(pairs_out), "removed": int(pairs_in - pairs_out)})
+
+    # 1. Filtro de capas radiales a partir de los elementos medios
+    elements = mean_elements(objects)
+    primary_idx = np.arange(n_primary)
+    secondary_idx = np.arange(n_primary, len(objects))
+    counts_a, counts_b = shell_overlap_counts(elements, primary_idx, secondary_idx, pad_km)
+    pairs_total = n_primary * len(debris_and_rocket)
+    pairs_shell = int(counts_a.sum())
+    _stage("apogee_perigee", pairs_total, pairs_shell)
+
+    keep_a = primary_idx[counts_a > 0]
+    keep_b = secondary_idx[counts_b > 0]
+    keep = np.concatenate([keep_a, keep_b])
+    objects = [objects[i] for i in keep]
+    elements = select_rows(elements, keep)
+    primary_rows = np.arange(len(keep_a))
+    secondary_rows = np.arange(len(keep_a), len(keep))
+    filtered = time.perf_counter()
+
+    # 2. Propagación única (SatrecArray) de los objetos restantes, directamente sobre el bloque compartido
+    times, _ = build_time_grid(start_time, duration_hours, interval_minutes, align=start_time is None)
+    if screening_km is None:
+        screening_km = default_screening_km(threshold_km, interval_minutes)
+    params = {
+        "threshold_km": threshold_km,
+        "screening_km": screening_km,
+        "pad_km": pad_km,
+        "orbit_path_filter": orbit_path_filter,
+    }
+    tle_pairs = [(obj.tle_line1, obj.tle_line2) for obj in objects]
+    ephemeris_dtype = ephemeris_dtype or SCAN_EPHEMERIS_DTYPE
+    with SharedEphemeris.create((len(objects), len(times), 3), ephemeris_dtype) as ephemeris:
+        _, propagation_errors = propagate_positions(tle_pairs, times, interval_minutes, out=ephemeris.array)
+        propagated = time.perf_counter()
+
+        # 3-4. Rejilla espacial, filtros por par y refinamiento del TCA, repartidos por shards de primarias
+        (rows_a, rows_b, tca_minutes, distances, speeds), counts = run_sharded_scan(
+            ephemeris, times[0], interval_minutes, tle_pairs, elements, primary_rows, secondary_rows, params, workers
+        )
+    _stage("spatial_hash", pairs_shell, counts["spatial_hash"])
+    pairs_in = counts["spatial_hash"]
+    if orbit_path_filter:
+        _stage("orbit_path", pairs_in, counts["orbit_path"])
+        pairs_in = counts["orbit_path"]
+    _stage("tca_refinement", pairs_in, counts["tca_refinement"])
+
     results = []
-    for sat in satellites:
-        for obj in debris_and_rocket:
-            approaches = detect_close_approaches_func(
-                sat.tle_line1, sat.tle_line2, sat.name,
-                obj.tle_line1, obj.tle_line2, obj.name,
-                threshold_km=threshold_km,
-            )
-            for approach in approaches:
-                results.append((sat.name, obj.name, approach["time"], approach["distance_km"]))
-    return results
+    pcs = max_pc_km(distances)
+    for row_a, row_b, minutes, distance, speed, pc in zip(rows_a, rows_b, tca_minutes, distances, speeds, pcs):
+        sat, obj = objects[row_a], objects[row_b]
+        results.append(
+            {
+                "sat_1_id": str(sat.norad_id),
+                "sat_1_name": sat.name,
+                "sat_2_id": str(obj.norad_id),
+                "sat_2_name": obj.name,
+                "time": times[0] + timedelta(minutes=float(minutes)),
+                "distance_km": round(float(distance), 3),
+                "relative_velocity_km_s": round(float(speed), 3),
+                "pc_max": float(pc),
+            }
+        )
+
+    stats = {
+        "objects": n_primary + len(debris_and_rocket),
+        "objects_propagated": len(objects),
+        "propagation_errors": len(propagation_errors),
+        "time_steps": len(times),
+        "ephemeris_dtype": np.dtype(ephemeris_dtype).name,
+        "pairs_total": pairs_total,
+        "screening_km": round(screening_km, 3),
+        "stages": stages,
+        "close_approaches": len(results),
+        "element_filter_s": round(filtered - started, 3),
+        "propagation_s": round(propagated - filtered, 3),
+        "screening_s": round(time.perf_counter() - propagated, 3),
+        "broad_phase_cpu_s": round(counts["broad_phase_s"], 3),
+        "refinement_cpu_s": round(counts["refinement_s"], 3),
+    }
+    return results, stats
@@ -0,0 +1,51 @@
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import and_
+
+from app.utils.pagination import to_naive_utc
+
+
+def _parse_bound(value, is_end):
+    value = value.strip()
+    if not value:
+        return None
+    if len(value) == 10:
+        day = date.fromisoformat(value)
+        # Fecha sin hora: el final del rango incluye ese día completo
+        return datetime.combine(day + timedelta(days=1) if is_end else day, datetime.min.time())
+    return to_naive_utc(datetime.fromisoformat(value.replace("Z", "+00:00")))
+
+
+def parse_date_range(value):
+    """
+    Convierte un parámetro de fecha en un rango semiabierto [inicio, fin):
+      "2025-06-17"                      -> ese día completo
+      "2025-06-01/2025-06-17"           -> del 1 al 17 de junio, ambos incluidos
+      "2025-06-17T12:00:00Z/"           -> desde ese instante (fin abierto)
+      "/2025-06-17T12:00:00Z"           -> hasta ese instante (excluido)
+    Lanza ValueError si el formato no es válido.
+    """
+    try:
+        if "/" in value:
+            start, end = value.split("/", 1)
+            start, end = _parse_bound(start, False), _parse_bound(end, True)
+        elif len(value.strip()) == 10:
+            start, end = _parse_bound(value, False), _parse_bound(value, True)
+        else:
+            raise ValueError("use YYYY-MM-DD o inicio/fin")
+    except ValueError as e:
+        raise ValueError(f"rango de fechas no válido '{value}': {e}") from e
+    if start is not None and end is not None and end <= start:
+        raise ValueError(f"rango de fechas vacío '{value}'")
+    return start, end
+
+
+def date_range_filter(column, value):
+    """Predicado indexable column >= inicio AND column < fin (sin CAST sobre la columna)."""
+    start, end = parse_date_range(value)
+    conditions = []
+    if start is not None:
+        conditions.append(column >= start)
+    if end is not None:
+        conditions.append(column < end)
+    return and_(*conditions)
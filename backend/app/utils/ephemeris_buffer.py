@@ -0,0 +1,62 @@
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+class SharedEphemeris:
+    """
+    Efemérides de un escaneo (N_objetos, T, 3) publicadas una sola vez en memoria compartida.
+    El proceso que la crea es el dueño y la libera al salir del bloque `with`; los procesos del pool
+    se adjuntan con `attach(handle)` sin copiar los datos y acceden a las filas por índice de objeto.
+    """
+
+    def __init__(self, shm, shape, dtype, owner):
+        self._shm = shm
+        self._owner = owner
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.array = np.ndarray(self.shape, dtype=self.dtype, buffer=shm.buf)
+
+    @classmethod
+    def create(cls, shape, dtype=np.float64):
+        """Reserva el bloque compartido inicializado a NaN (objetos sin propagar)."""
+        dtype = np.dtype(dtype)
+        size = max(1, int(np.prod(shape)) * dtype.itemsize)
+        ephemeris = cls(shared_memory.SharedMemory(create=True, size=size), shape, dtype, owner=True)
+        ephemeris.array.fill(np.nan)
+        return ephemeris
+
+    @classmethod
+    def publish(cls, positions, dtype=None):
+        """Copia un array de posiciones ya calculado (p. ej. de extract_position_series) al bloque compartido."""
+        ephemeris = cls.create(positions.shape, dtype or positions.dtype)
+        ephemeris.array[...] = positions
+        return ephemeris
+
+    @classmethod
+    def attach(cls, handle):
+        """Se adjunta a un bloque publicado por otro proceso a partir de su handle."""
+        name, shape, dtype = handle
+        return cls(shared_memory.SharedMemory(name=name), shape, dtype, owner=False)
+
+    @property
+    def handle(self):
+        """Datos mínimos (serializables) para adjuntarse desde otro proceso."""
+        return self._shm.name, self.shape, self.dtype.str
+
+    @property
+    def nbytes(self):
+        return self.array.nbytes
+
+    def close(self):
+        # Las vistas de NumPy deben soltarse antes de cerrar el buffer compartido
+        self.array = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,153 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+# Directorio de los .npy persistentes ("" = solo caché en memoria)
+EPHEMERIS_CACHE_DIR = os.getenv("EPHEMERIS_CACHE_DIR", "./ephemeris_cache")
+# Entradas máximas en la LRU en memoria
+EPHEMERIS_CACHE_SIZE = int(os.getenv("EPHEMERIS_CACHE_SIZE", "20000"))
+# Antigüedad máxima de los ficheros en disco antes de purgarlos
+EPHEMERIS_CACHE_MAX_AGE_HOURS = 48
+
+
+def tle_hash(tle1, tle2):
+    """Huella corta de un TLE: cambia cada vez que el fetcher guarda un TLE nuevo."""
+    return hashlib.sha1(f"{tle1.strip()}\n{tle2.strip()}".encode()).hexdigest()[:16]
+
+
+def align_start(start_time, interval_minutes):
+    """Redondea hacia abajo al múltiplo de interval_minutes (UTC) para que peticiones cercanas compartan rejilla."""
+    start_time = start_time.astimezone(timezone.utc)
+    step = timedelta(minutes=interval_minutes)
+    epoch = datetime(2000, 1, 1, tzinfo=timezone.utc)
+    return epoch + ((start_time - epoch) // step) * step
+
+
+def ephemeris_key(kind, tle1, tle2, start_time, interval_minutes, steps):
+    """Clave de caché: (tipo, norad_id, hash del TLE, inicio de la rejilla, paso, número de pasos)."""
+    return (
+        kind,
+        int(tle1[2:7]),
+        tle_hash(tle1, tle2),
+        start_time.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%S"),
+        float(interval_minutes),  # 10 y 10.0 (query param) comparten fichero
+        steps,
+    )
+
+
+class EphemerisCache:
+    """
+    Caché de efemérides precalculadas: LRU en memoria respaldada por ficheros .npy. Los ficheros se
+    leen enteros a memoria (un memmap por entrada dejaría abierto un descriptor por cada una y agotaría
+    el límite del proceso). Las entradas de un NORAD ID se invalidan cuando cambia su TLE.
+    """
+
+    def __init__(self, directory=EPHEMERIS_CACHE_DIR, max_entries=EPHEMERIS_CACHE_SIZE):
+        self.directory = directory
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._keys_by_norad = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        kind, norad_id, digest, start, interval, steps = key
+        return os.path.join(self.directory, str(norad_id), f"{digest}_{kind}_{start}_{interval}m_{steps}.npy")
+
+    def get(self, key):
+        with self._lock:
+            array = self._entries.get(key)
+            if array is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return array
+        if self.directory:
+            try:
+                array = np.load(self._path(key))
+            except (OSError, ValueError):
+                array = None
+            if array is not None:
+                array.flags.writeable = False
+                self._remember(key, array)
+                with self._lock:
+                    self.hits += 1
+                return array
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, array, persist=True):
+        array = np.ascontiguousarray(array)
+        self._remember(key, array)
+        if self.directory and persist:
+            path = self._path(key)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(tmp_path, "wb") as f:
+                    np.save(f, array)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                print(f"Error writing ephemeris cache {path}: {e}")
+        return array
+
+    def get_or_compute(self, key, compute):
+        array = self.get(key)
+        if array is None:
+            array = self.put(key, compute())
+        return array
+
+    def _remember(self, key, array):
+        with self._lock:
+            self._entries[key] = array
+            self._entries.move_to_end(key)
+            self._keys_by_norad.setdefault(key[1], set()).add(key)
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self._keys_by_norad.get(evicted[1], set()).discard(evicted)
+
+    def invalidate(self, norad_id, keep_hash=None):
+        """Descarta las efemérides de un NORAD ID salvo las del TLE vigente (keep_hash)."""
+        with self._lock:
+            keys = self._keys_by_norad.get(norad_id, set())
+            for key in [k for k in keys if k[2] != keep_hash]:
+                keys.discard(key)
+                self._entries.pop(key, None)
+        if self.directory:
+            folder = os.path.join(self.directory, str(norad_id))
+            try:
+                filenames = os.listdir(folder)
+            except OSError:
+                return
+            for filename in filenames:
+                if keep_hash is None or not filename.startswith(f"{keep_hash}_"):
+                    try:
+                        os.remove(os.path.join(folder, filename))
+                    except OSError:
+                        pass
+
+    def prune(self, max_age_hours=EPHEMERIS_CACHE_MAX_AGE_HOURS):
+        """Elimina del disco las rejillas antiguas que ya no se van a volver a pedir."""
+        if not self.directory:
+            return 0
+        cutoff = time.time() - max_age_hours * 3600
+        removed = 0
+        for folder, _, filenames in os.walk(self.directory):
+            for filename in filenames:
+                path = os.path.join(folder, filename)
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                        removed += 1
+                except OSError:
+                    pass
+        return removed
+
+
+ephemeris_cache = EphemerisCache()
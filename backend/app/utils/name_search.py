@@ -0,0 +1,134 @@
+from sqlalchemy import column, func, select, table, text
+
+from app.models import Satellite
+
+# Los índices de trigramas solo sirven a partir de 3 caracteres; por debajo se usa LIKE (acotado por LIMIT)
+MIN_TRIGRAM_CHARS = 3
+SEARCH_FTS_TABLE = "satellites_name_fts"
+# Candidatos por subcadena que se ordenan como máximo en cada búsqueda de autocompletado
+SEARCH_CANDIDATES = 200
+
+# Dialecto con índice de nombres disponible ("postgresql", "sqlite" o None = solo ILIKE)
+_index_dialect = None
+
+
+def setup_name_search(engine):
+    """
+    Crea el índice de búsqueda por subcadena sobre satellites.name:
+      - PostgreSQL: extensión pg_trgm e índice GIN (name gin_trgm_ops), que usan ILIKE '%q%' directamente.
+      - SQLite: tabla FTS5 con tokenizador trigram sincronizada con triggers (contenido externo).
+    Si el motor no lo permite se sigue con ILIKE sin índice.
+    """
+    global _index_dialect
+    dialect = engine.dialect.name
+    try:
+        with engine.begin() as conn:
+            if dialect == "postgresql":
+                conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+                conn.execute(
+                    text("CREATE INDEX IF NOT EXISTS ix_satellites_name_trgm ON satellites USING gin (name gin_trgm_ops)")
+                )
+            elif dialect == "sqlite":
+                exists = conn.execute(
+                    text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": SEARCH_FTS_TABLE}
+                ).first()
+                conn.execute(
+                    text(
+                        f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_FTS_TABLE} USING fts5("
+                        "name, content='satellites', content_rowid='id', tokenize='trigram')"
+                    )
+                )
+                conn.execute(
+                    text(
+                        f"CREATE TRIGGER IF NOT EXISTS satellites_name_fts_ai AFTER INSERT ON satellites BEGIN "
+                        f"INSERT INTO {SEARCH_FTS_TABLE}(rowid, name) VALUES (new.id, new.name); END"
+                    )
+                )
+                conn.execute(
+                    text(
+                        f"CREATE TRIGGER IF NOT EXISTS satellites_name_fts_ad AFTER DELETE ON satellites BEGIN "
+                        f"INSERT INTO {SEARCH_FTS_TABLE}({SEARCH_FTS_TABLE}, rowid, name) VALUES ('delete', old.id, old.name); END"
+                    )
+                )
+                conn.execute(
+                    text(
+                        f"CREATE TRIGGER IF NOT EXISTS satellites_name_fts_au AFTER UPDATE OF name ON satellites BEGIN "
+                        f"INSERT INTO {SEARCH_FTS_TABLE}({SEARCH_FTS_TABLE}, rowid, name) VALUES ('delete', old.id, old.name); "
+                        f"INSERT INTO {SEARCH_FTS_TABLE}(rowid, name) VALUES (new.id, new.name); END"
+                    )
+                )
+                if not exists:
+                    # Primera vez: indexar los nombres que ya hay en la tabla
+                    conn.execute(text(f"INSERT INTO {SEARCH_FTS_TABLE}({SEARCH_FTS_TABLE}) VALUES ('rebuild')"))
+            else:
+                return
+        _index_dialect = dialect
+    except Exception as e:
+        print(f"⚠️ Name search index not available ({dialect}), falling back to ILIKE: {e}")
+
+
+def name_contains(term):
+    """Condición "el nombre contiene term" (sin distinguir mayúsculas) que aprovecha el índice disponible."""
+    if _index_dialect == "sqlite" and len(term) >= MIN_TRIGRAM_CHARS:
+        phrase = '"' + term.replace('"', '""') + '"'
+        match = text(f"{SEARCH_FTS_TABLE} MATCH :phrase").bindparams(phrase=phrase)
+        return Satellite.id.in_(select(text("rowid")).select_from(text(SEARCH_FTS_TABLE)).where(match))
+    # En PostgreSQL el índice GIN de trigramas atiende ILIKE '%term%'
+    return Satellite.name.ilike(f"%{_escape_like(term)}%", escape="\\")
+
+
+def _escape_like(term):
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _substring_candidates(db, term, object_type, limit):
+    """Hasta `limit` nombres que contienen term, leídos del índice de trigramas sin ordenar todo el resultado."""
+    query = db.query(Satellite.id, Satellite.norad_id, Satellite.name, Satellite.object_type)
+    if _index_dialect == "sqlite" and len(term) >= MIN_TRIGRAM_CHARS:
+        # JOIN (no IN) para que SQLite recorra la tabla FTS y pare al llegar al LIMIT
+        fts = table(SEARCH_FTS_TABLE, column("rowid"))
+        phrase = '"' + term.replace('"', '""') + '"'
+        query = query.join(fts, fts.c.rowid == Satellite.id).filter(
+            text(f"{SEARCH_FTS_TABLE} MATCH :phrase").bindparams(phrase=phrase)
+        )
+    else:
+        query = query.filter(name_contains(term))
+    if object_type:
+        query = query.filter(Satellite.object_type == object_type)
+    return query.limit(limit).all()
+
+
+def search_names(db, term, limit=10, object_type=None):
+    """
+    Búsqueda para autocompletar en dos niveles:
+      1. Coincidencia exacta y prefijo, por rango sobre el índice lower(name) (orden alfabético).
+      2. Si faltan resultados, hasta SEARCH_CANDIDATES nombres que contienen el texto, ordenados por
+         inicio de palabra y longitud.
+    El trabajo queda acotado aunque el texto coincida con miles de nombres.
+    Devuelve filas (id, norad_id, name, object_type).
+    """
+    term = term.strip()
+    lowered_term = term.lower()
+    lowered = func.lower(Satellite.name)
+
+    query = db.query(Satellite.id, Satellite.norad_id, Satellite.name, Satellite.object_type).filter(
+        lowered >= lowered_term,
+        lowered <= lowered_term + "\U0010ffff",
+        lowered.like(f"{_escape_like(lowered_term)}%", escape="\\"),
+    )
+    if object_type:
+        query = query.filter(Satellite.object_type == object_type)
+    results = sorted(query.order_by(lowered).limit(limit).all(), key=lambda r: r.name.lower() != lowered_term)
+    if len(results) >= limit:
+        return results
+
+    seen = {r.id for r in results}
+
+    def _rank(row):
+        name = row.name.lower()
+        word_start = any(name.startswith(lowered_term, i + 1) for i, ch in enumerate(name) if ch in " -(/")
+        return (not word_start, len(name), name)
+
+    candidates = _substring_candidates(db, term, object_type, SEARCH_CANDIDATES)
+    rest = sorted((r for r in candidates if r.id not in seen), key=_rank)
+    return results + rest[: limit - len(results)]
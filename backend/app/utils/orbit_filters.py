@@ -0,0 +1,124 @@
+import numpy as np
+
+EARTH_MU_KM3_S2 = 398600.4418
+EARTH_RADIUS_KM = 6378.137
+
+# Margen por defecto sobre el umbral: términos de corto periodo (J2) entre elementos
+# medios y osculadores más la deriva del perigeo en la ventana del escaneo.
+DEFAULT_SHELL_PAD_KM = 25.0
+
+
+def mean_elements(objects):
+    """
+    Lee una sola vez los elementos medios de tle_line2 de cada objeto.
+    Devuelve un dict de arrays (ángulos en radianes, radios en km). Si una línea no se puede
+    leer, su perigeo/apogeo quedan en -inf/+inf para que el objeto no se descarte nunca.
+    """
+    n = len(objects)
+    elements = {
+        "inclination": np.zeros(n),
+        "raan": np.zeros(n),
+        "eccentricity": np.zeros(n),
+        "arg_perigee": np.zeros(n),
+        "semi_major_axis_km": np.full(n, np.nan),
+        "perigee_km": np.full(n, -np.inf),
+        "apogee_km": np.full(n, np.inf),
+    }
+    for row, obj in enumerate(objects):
+        try:
+            line2 = obj.tle_line2
+            inclination = np.radians(float(line2[8:16]))
+            raan = np.radians(float(line2[17:25]))
+            eccentricity = float("0." + line2[26:33].strip())
+            arg_perigee = np.radians(float(line2[34:42]))
+            mean_motion = float(line2[52:63]) * 2 * np.pi / 86400.0  # rad/s
+            semi_major_axis = (EARTH_MU_KM3_S2 / mean_motion**2) ** (1 / 3)
+        except (TypeError, ValueError, ZeroDivisionError):
+            continue
+        elements["inclination"][row] = inclination
+        elements["raan"][row] = raan
+        elements["eccentricity"][row] = eccentricity
+        elements["arg_perigee"][row] = arg_perigee
+        elements["semi_major_axis_km"][row] = semi_major_axis
+        elements["perigee_km"][row] = semi_major_axis * (1 - eccentricity)
+        elements["apogee_km"][row] = semi_major_axis * (1 + eccentricity)
+    return elements
+
+
+def select_rows(elements, rows):
+    """Subconjunto de filas de un dict devuelto por mean_elements."""
+    return {key: values[rows] for key, values in elements.items()}
+
+
+def shell_overlap_counts(elements, primary_rows, secondary_rows, pad_km=DEFAULT_SHELL_PAD_KM):
+    """
+    Índice de intervalos sobre los radios [perigeo, apogeo]: para cada primaria cuenta cuántas
+    secundarias tienen una capa radial que se solapa (con margen pad_km), y viceversa.
+    Dos capas no se solapan si una está entera por debajo de la otra, así que el conteo es
+    (secundarias con perigeo <= apogeo + pad) - (secundarias con apogeo < perigeo - pad).
+    """
+    per_a = elements["perigee_km"][primary_rows]
+    apo_a = elements["apogee_km"][primary_rows]
+    per_b = elements["perigee_km"][secondary_rows]
+    apo_b = elements["apogee_km"][secondary_rows]
+
+    def _counts(per_q, apo_q, per_idx, apo_idx):
+        sorted_per = np.sort(per_idx)
+        sorted_apo = np.sort(apo_idx)
+        reach = np.searchsorted(sorted_per, apo_q + pad_km, side="right")
+        below = np.searchsorted(sorted_apo, per_q - pad_km, side="left")
+        return reach - below
+
+    return _counts(per_a, apo_a, per_b, apo_b), _counts(per_b, apo_b, per_a, apo_a)
+
+
+def shell_overlap_mask(elements, rows_a, rows_b, pad_km=DEFAULT_SHELL_PAD_KM):
+    """Máscara por par: True si las capas radiales de ambos objetos se solapan dentro de pad_km."""
+    per, apo = elements["perigee_km"], elements["apogee_km"]
+    return (per[rows_b] <= apo[rows_a] + pad_km) & (apo[rows_b] >= per[rows_a] - pad_km)
+
+
+def _orbit_frame(elements, rows):
+    """Vectores unitarios de perigeo (P), semilatus (Q) y normal (W) de cada órbita."""
+    raan = elements["raan"][rows]
+    inc = elements["inclination"][rows]
+    argp = elements["arg_perigee"][rows]
+    cos_o, sin_o = np.cos(raan), np.sin(raan)
+    cos_i, sin_i = np.cos(inc), np.sin(inc)
+    cos_w, sin_w = np.cos(argp), np.sin(argp)
+    p_vec = np.stack(
+        [cos_o * cos_w - sin_o * sin_w * cos_i, sin_o * cos_w + cos_o * sin_w * cos_i, sin_w * sin_i], axis=-1
+    )
+    q_vec = np.stack(
+        [-cos_o * sin_w - sin_o * cos_w * cos_i, -sin_o * sin_w + cos_o * cos_w * cos_i, cos_w * sin_i], axis=-1
+    )
+    w_vec = np.stack([sin_o * sin_i, -cos_o * sin_i, cos_i], axis=-1)
+    return p_vec, q_vec, w_vec
+
+
+def orbit_path_mask(elements, rows_a, rows_b, pad_km=DEFAULT_SHELL_PAD_KM):
+    """
+    Filtro geométrico opcional: compara el radio de ambas órbitas en la línea de nodos mutua.
+    Si en los dos nodos la diferencia radial supera pad_km, las trayectorias no se cruzan.
+    Los pares casi coplanares (separación fuera del plano menor que pad_km) se conservan.
+    Supone elementos fijos durante la ventana, por lo que pad_km debe cubrir la deriva por J2.
+    """
+    p_a, q_a, w_a = _orbit_frame(elements, rows_a)
+    p_b, q_b, w_b = _orbit_frame(elements, rows_b)
+    nodes = np.cross(w_a, w_b)
+    sin_mutual = np.linalg.norm(nodes, axis=-1)
+    r_max = np.maximum(elements["apogee_km"][rows_a], elements["apogee_km"][rows_b])
+    coplanar = r_max * sin_mutual <= pad_km
+    nodes = nodes / np.where(sin_mutual > 0, sin_mutual, 1.0)[:, None]
+
+    def _radius(rows, p_vec, q_vec, direction):
+        true_anomaly = np.arctan2(np.einsum("nk,nk->n", direction, q_vec), np.einsum("nk,nk->n", direction, p_vec))
+        ecc = elements["eccentricity"][rows]
+        semi_latus = elements["semi_major_axis_km"][rows] * (1 - ecc**2)
+        return semi_latus / (1 + ecc * np.cos(true_anomaly))
+
+    ascending = np.abs(_radius(rows_a, p_a, q_a, nodes) - _radius(rows_b, p_b, q_b, nodes))
+    descending = np.abs(_radius(rows_a, p_a, q_a, -nodes) - _radius(rows_b, p_b, q_b, -nodes))
+    # Elementos ilegibles (NaN) comparan como False y el par se conserva
+    separated = (ascending > pad_km) & (descending > pad_km)
+    return coplanar | ~separated
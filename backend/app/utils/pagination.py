@@ -0,0 +1,77 @@
+import base64
+import json
+from datetime import datetime, timezone
+
+from sqlalchemy import and_, or_
+
+# Tamaño de página por defecto y máximo de los listados paginados
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(sort_value, row_id):
+    """Cursor opaco (base64 url-safe) con el valor de ordenación y el id de la última fila de la página."""
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([sort_value, row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor, is_datetime=True):
+    """Inverso de encode_cursor. Lanza ValueError si el cursor no es válido."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort_value, row_id = json.loads(raw)
+        if is_datetime:
+            sort_value = datetime.fromisoformat(sort_value)
+    except Exception as e:
+        raise ValueError(f"cursor no válido: {cursor}") from e
+    return sort_value, row_id
+
+
+def keyset_page(query, sort_column, id_column, cursor=None, descending=False):
+    """
+    Ordena por (sort_column, id_column) y, si hay cursor, continúa justo después de esa fila
+    (paginación por clave: sin OFFSET, usa el índice compuesto correspondiente).
+    """
+    if cursor is not None:
+        sort_value, row_id = cursor
+        if descending:
+            after = or_(sort_column < sort_value, and_(sort_column == sort_value, id_column < row_id))
+        else:
+            after = or_(sort_column > sort_value, and_(sort_column == sort_value, id_column > row_id))
+        query = query.filter(after)
+    if descending:
+        return query.order_by(sort_column.desc(), id_column.desc())
+    return query.order_by(sort_column.asc(), id_column.asc())
+
+
+def parse_fields(fields, allowed, required=()):
+    """
+    Convierte `fields=a,b,c` en la lista de columnas a seleccionar (en el orden de `allowed`).
+    Las columnas de `required` (id y clave de ordenación, necesarias para el cursor) se añaden siempre.
+    """
+    if not fields:
+        return list(allowed)
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - set(allowed)
+    if unknown:
+        raise ValueError(f"campos desconocidos: {', '.join(sorted(unknown))}")
+    requested.update(required)
+    return [name for name in allowed if name in requested]
+
+
+def build_page(rows, limit, sort_field):
+    """Recibe hasta limit + 1 filas (dicts) y devuelve (página, next_cursor)."""
+    page = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit and page:
+        next_cursor = encode_cursor(page[-1][sort_field], page[-1]["id"])
+    return page, next_cursor
+
+
+def to_naive_utc(value):
+    """Las fechas se guardan como UTC sin zona: normaliza los filtros que llegan con zona horaria."""
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
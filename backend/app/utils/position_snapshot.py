@@ -0,0 +1,122 @@
+import gzip
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from app.catalog_propagator import compile_catalog, propagate_catalog, teme_to_geodetic
+from app.collision_detector import get_timescale
+from app.database import SessionLocal
+from app.models import Satellite
+
+# Segundos que se reutiliza una instantánea de posiciones entre peticiones
+POSITIONS_TTL_S = float(os.getenv("POSITIONS_TTL_S", "5"))
+# Antigüedad máxima del catálogo compilado (TLEs escritos por otros procesos); el fetcher lo invalida al momento
+POSITIONS_CATALOG_TTL_S = float(os.getenv("POSITIONS_CATALOG_TTL_S", "600"))
+POSITIONS_BINARY_LAYOUT = "norad_id:int32le[count],lat,lon,alt:float32le[count,3]"
+
+
+class PositionSnapshot:
+    """
+    Posición actual de todo el catálogo, propagada en bloque y compartida por todas las peticiones
+    durante POSITIONS_TTL_S. Solo un hilo recalcula a la vez (single-flight): el resto espera y
+    recibe el mismo resultado. Los cuerpos JSON y binario se codifican una vez por instantánea.
+    """
+
+    def __init__(self, ttl_s=POSITIONS_TTL_S, catalog_ttl_s=POSITIONS_CATALOG_TTL_S):
+        self.ttl_s = ttl_s
+        self.catalog_ttl_s = catalog_ttl_s
+        self._catalog = None
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self.stats = {"snapshots": 0, "catalog_loads": 0, "last_compute_s": None}
+
+    def invalidate_catalog(self, *_):
+        self._catalog = None
+
+    def _fresh(self, snapshot):
+        return snapshot is not None and time.monotonic() - snapshot["computed_at"] < self.ttl_s
+
+    def get(self, format="json"):
+        """
+        Devuelve (instantánea, cuerpo codificado en `format`: "json", "binary" o con sufijo "+gzip"),
+        recalculando solo si la instantánea ha caducado.
+        """
+        snapshot = self._snapshot
+        if not self._fresh(snapshot) or format not in snapshot["bodies"]:
+            with self._lock:
+                snapshot = self._snapshot
+                if not self._fresh(snapshot):
+                    snapshot = self._compute()
+                    self._snapshot = snapshot
+                if format not in snapshot["bodies"]:
+                    snapshot["bodies"][format] = self._encode(snapshot, format)
+        return snapshot, snapshot["bodies"][format]
+
+    def _load_catalog(self):
+        db = SessionLocal()
+        try:
+            rows = db.query(Satellite.norad_id, Satellite.tle_line1, Satellite.tle_line2).order_by(Satellite.norad_id).all()
+        finally:
+            db.close()
+        tle_pairs = [(tle1, tle2) for _, tle1, tle2 in rows]
+        self.stats["catalog_loads"] += 1
+        return {
+            "loaded_at": time.monotonic(),
+            "norad_ids": np.array([norad_id for norad_id, _, _ in rows], dtype=np.int32),
+            "tle_pairs": tle_pairs,
+            "compiled": compile_catalog(tle_pairs),
+        }
+
+    def _compute(self):
+        started = time.perf_counter()
+        catalog = self._catalog
+        if catalog is None or time.monotonic() - catalog["loaded_at"] > self.catalog_ttl_s:
+            catalog = self._catalog = self._load_catalog()
+
+        epoch = datetime.now(timezone.utc)
+        lat = lon = alt = np.empty((0, 1))
+        if catalog["tle_pairs"]:
+            r, _, _ = propagate_catalog(catalog["tle_pairs"], [epoch], compiled=catalog["compiled"])
+            lat, lon, alt = teme_to_geodetic(r, get_timescale().from_datetimes([epoch]))
+        # Los objetos que sgp4 no puede propagar (p. ej. decaídos) no se incluyen
+        ok = ~np.isnan(alt[:, 0])
+        snapshot = {
+            "computed_at": time.monotonic(),
+            "epoch": epoch,
+            "catalog_count": len(catalog["tle_pairs"]),
+            "norad_ids": catalog["norad_ids"][ok],
+            "positions": np.stack([lat[ok, 0], lon[ok, 0], alt[ok, 0]], axis=1).astype(np.float32),
+            "bodies": {},
+        }
+        self.stats["snapshots"] += 1
+        self.stats["last_compute_s"] = round(time.perf_counter() - started, 4)
+        return snapshot
+
+    def _encode(self, snapshot, format):
+        base, _, encoding = format.partition("+")
+        if encoding == "gzip":
+            if base not in snapshot["bodies"]:
+                snapshot["bodies"][base] = self._encode(snapshot, base)
+            return gzip.compress(snapshot["bodies"][base], compresslevel=5)
+        if format == "binary":
+            return snapshot["norad_ids"].astype("<i4").tobytes() + snapshot["positions"].astype("<f4").tobytes()
+        positions = snapshot["positions"].astype(np.float64)
+        body = {
+            "status": "success",
+            "data": {
+                "epoch": snapshot["epoch"].strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+                "norad_id": snapshot["norad_ids"].tolist(),
+                "lat": np.round(positions[:, 0], 4).tolist(),
+                "lon": np.round(positions[:, 1], 4).tolist(),
+                "alt": np.round(positions[:, 2], 2).tolist(),
+            },
+            "count": len(snapshot["norad_ids"]),
+        }
+        return json.dumps(body, separators=(",", ":")).encode()
+
+
+position_snapshot = PositionSnapshot()
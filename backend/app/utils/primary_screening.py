@@ -0,0 +1,158 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from sqlalchemy import func
+
+from app.catalog_propagator import build_satrecs, propagate_positions
+from app.collision_detector import build_time_grid, find_encounters
+from app.models import Satellite
+from app.utils.collision_probability import max_pc_km
+from app.utils.ephemeris_cache import tle_hash
+from app.utils.orbit_filters import DEFAULT_SHELL_PAD_KM, mean_elements, orbit_path_mask, shell_overlap_mask
+from app.utils.spatial_hash import default_screening_km
+
+# Resultados de cribado guardados (LRU); la clave incluye la versión del catálogo y el TLE de la primaria
+SCREENING_CACHE_SIZE = int(os.getenv("SCREENING_CACHE_SIZE", "256"))
+SCREENING_MAX_HOURS = 72
+
+_lock = threading.Lock()
+_catalog = {"version": None}
+_results = OrderedDict()
+
+
+def catalog_version(db):
+    """Versión barata del catálogo: número de objetos y último updated_at (índice ix_satellites_updated_at)."""
+    count, last_update = db.query(func.count(Satellite.id), func.max(Satellite.updated_at)).one()
+    return count, last_update.isoformat() if last_update else None
+
+
+def _get_catalog(db, version):
+    """Catálogo (TLEs y elementos medios) cargado una vez por versión y compartido entre peticiones."""
+    with _lock:
+        if _catalog["version"] == version:
+            return _catalog
+        rows = db.query(
+            Satellite.norad_id, Satellite.name, Satellite.object_type, Satellite.tle_line1, Satellite.tle_line2
+        ).all()
+        _catalog.update(
+            version=version,
+            objects=rows,
+            elements=mean_elements(rows),
+            row_by_norad={row.norad_id: i for i, row in enumerate(rows)},
+        )
+        return _catalog
+
+
+def screen_primary(
+    db,
+    norad_id,
+    duration_hours=24,
+    interval_minutes=10,
+    threshold_km=5.0,
+    shell_pad_km=DEFAULT_SHELL_PAD_KM,
+    orbit_path_filter=True,
+):
+    """
+    Cribado de un único objeto contra todo el catálogo: filtro de capas radiales (y de línea de nodos),
+    efemérides de la caché para los candidatos y refinamiento del TCA. Devuelve los encuentros ordenados
+    por distancia, o None si el NORAD ID no está en el catálogo. El resultado se reutiliza mientras no
+    cambien el catálogo, el TLE de la primaria ni la rejilla (inicio alineado al intervalo).
+    La rejilla es la del escaneo completo (inicio alineado antes de ahora, mismos pasos) para leer sus
+    efemérides de la caché; solo se devuelven los encuentros con TCA entre ahora y ahora + duration_hours.
+    """
+    started = time.perf_counter()
+    now = datetime.now(timezone.utc)
+    version = catalog_version(db)
+    catalog = _get_catalog(db, version)
+    row = catalog["row_by_norad"].get(norad_id)
+    if row is None:
+        return None
+    objects, elements = catalog["objects"], catalog["elements"]
+    primary = objects[row]
+
+    times, _ = build_time_grid(now, duration_hours, interval_minutes, align=True)
+    key = (
+        norad_id, tle_hash(primary.tle_line1, primary.tle_line2), version,
+        times[0], duration_hours, interval_minutes, threshold_km, shell_pad_km, orbit_path_filter,
+    )
+    with _lock:
+        cached = _results.get(key)
+        if cached is not None:
+            _results.move_to_end(key)
+            return _upcoming(cached, now, duration_hours, cached=True)
+
+    # 1. Filtros geométricos sobre los elementos medios de todo el catálogo
+    pad_km = threshold_km + shell_pad_km
+    others = np.flatnonzero(np.arange(len(objects)) != row)
+    primaries = np.full(len(others), row)
+    candidates = others[shell_overlap_mask(elements, primaries, others, pad_km)]
+    stages = {"catalog": len(others), "apogee_perigee": len(candidates)}
+    if orbit_path_filter and len(candidates):
+        candidates = candidates[orbit_path_mask(elements, np.full(len(candidates), row), candidates, pad_km)]
+        stages["orbit_path"] = len(candidates)
+    filtered = time.perf_counter()
+
+    # 2. Efemérides de la primaria y los candidatos: las de la rejilla del escaneo completo ya están en la
+    #    caché; las nuevas se quedan solo en memoria para no escribir miles de ficheros en la petición
+    keep = np.concatenate([[row], candidates]).astype(np.intp)
+    tle_pairs = [(objects[i].tle_line1, objects[i].tle_line2) for i in keep]
+    positions, errors = propagate_positions(tle_pairs, times, interval_minutes, persist=False)
+    propagated = time.perf_counter()
+
+    # 3. Mínimos de la rejilla gruesa y TCA refinado (primaria = fila 0)
+    secondary = np.arange(1, len(keep))
+    rows_a, rows_b, tca_minutes, distances, speeds = find_encounters(
+        positions, times[0], interval_minutes, build_satrecs(tle_pairs),
+        np.zeros(len(secondary), dtype=np.intp), secondary, threshold_km=threshold_km,
+        window_km=default_screening_km(threshold_km, interval_minutes),
+    )
+    stages["tca_refinement"] = len(set(rows_b.tolist()))
+
+    pcs = max_pc_km(distances)
+    encounters = []
+    for i in np.argsort(distances, kind="stable"):
+        obj = objects[keep[rows_b[i]]]
+        encounters.append(
+            {
+                "norad_id": obj.norad_id,
+                "name": obj.name,
+                "object_type": obj.object_type,
+                "tca": times[0] + timedelta(minutes=float(tca_minutes[i])),
+                "distance_km": round(float(distances[i]), 3),
+                "relative_velocity_km_s": round(float(speeds[i]), 3),
+                "pc_max": float(pcs[i]),
+            }
+        )
+
+    result = {
+        "primary": {"norad_id": primary.norad_id, "name": primary.name, "object_type": primary.object_type},
+        "start_time": now,
+        "duration_hours": duration_hours,
+        "interval_minutes": interval_minutes,
+        "threshold_km": threshold_km,
+        "encounters": encounters,
+        "stats": {
+            "stages": stages,
+            "propagation_errors": len(errors),
+            "filter_s": round(filtered - started, 3),
+            "propagation_s": round(propagated - filtered, 3),
+            "refinement_s": round(time.perf_counter() - propagated, 3),
+        },
+        "cached": False,
+    }
+    with _lock:
+        _results[key] = result
+        while len(_results) > SCREENING_CACHE_SIZE:
+            _results.popitem(last=False)
+    return _upcoming(result, now, duration_hours, cached=False)
+
+
+def _upcoming(result, now, duration_hours, cached):
+    """Copia del resultado con los encuentros de la ventana [now, now + duration_hours)."""
+    end = now + timedelta(hours=duration_hours)
+    encounters = [e for e in result["encounters"] if now <= e["tca"] < end]
+    return {**result, "start_time": now, "encounters": encounters, "cached": cached}
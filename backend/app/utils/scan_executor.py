@@ -0,0 +1,122 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+
+from app.catalog_propagator import build_satrecs
+from app.collision_detector import find_encounters
+from app.utils.ephemeris_buffer import SharedEphemeris
+from app.utils.orbit_filters import orbit_path_mask, shell_overlap_mask
+from app.utils.spatial_hash import screen_candidate_pairs
+
+# Número de procesos del escaneo (0 = un proceso por núcleo)
+SCAN_WORKERS = int(os.getenv("COLLISION_SCAN_WORKERS", "0")) or (os.cpu_count() or 1)
+# Efemérides en float32 (opcional): mitad de memoria, ~0.5 m de resolución en LEO
+SCAN_EPHEMERIS_DTYPE = np.float32 if os.getenv("COLLISION_SCAN_FLOAT32", "").lower() in ("1", "true") else np.float64
+# Más shards que procesos para repartir la carga cuando unas primarias tienen más candidatos que otras
+SHARDS_PER_WORKER = 4
+
+# Estado de cada proceso del pool, cargado una única vez por el inicializador
+_worker_state = {}
+
+
+def screen_primary_rows(
+    positions, start_time, interval_minutes, satrecs, elements, primary_rows, secondary_rows, params
+):
+    """
+    Etapas de cribado y refinamiento para un subconjunto (shard) de primarias: rejilla espacial,
+    máscaras de capas radiales/línea de nodos y TCA fino. Solo trabaja con arrays, sin objetos ORM.
+    Devuelve (encuentros, conteos); encuentros = (filas_a, filas_b, tca_minutos, distancias_km, velocidades_km_s).
+    """
+    started = time.perf_counter()
+    counts = {}
+    candidates_a, candidates_b = screen_candidate_pairs(
+        positions, primary_rows, secondary_rows, params["screening_km"]
+    )
+    overlap = shell_overlap_mask(elements, candidates_a, candidates_b, params["pad_km"])
+    candidates_a, candidates_b = candidates_a[overlap], candidates_b[overlap]
+    counts["spatial_hash"] = len(candidates_a)
+
+    if params["orbit_path_filter"]:
+        crossing = orbit_path_mask(elements, candidates_a, candidates_b, params["pad_km"])
+        candidates_a, candidates_b = candidates_a[crossing], candidates_b[crossing]
+        counts["orbit_path"] = len(candidates_a)
+    screened = time.perf_counter()
+
+    encounters = find_encounters(
+        positions, start_time, interval_minutes, satrecs, candidates_a, candidates_b,
+        threshold_km=params["threshold_km"], window_km=params["screening_km"],
+    )
+    counts["tca_refinement"] = len(set(zip(encounters[0].tolist(), encounters[1].tolist())))
+    counts["broad_phase_s"] = screened - started
+    counts["refinement_s"] = time.perf_counter() - screened
+    return encounters, counts
+
+
+def _init_worker(ephemeris_handle, start_time, interval_minutes, tle_pairs, elements, secondary_rows, params):
+    # Se conserva la referencia al bloque compartido mientras viva el proceso
+    ephemeris = SharedEphemeris.attach(ephemeris_handle)
+    _worker_state.update(
+        ephemeris=ephemeris,
+        positions=ephemeris.array,
+        start_time=start_time,
+        interval_minutes=interval_minutes,
+        satrecs=build_satrecs(tle_pairs),
+        elements=elements,
+        secondary_rows=secondary_rows,
+        params=params,
+    )
+
+
+def _scan_shard(primary_rows):
+    state = _worker_state
+    return screen_primary_rows(
+        state["positions"], state["start_time"], state["interval_minutes"], state["satrecs"],
+        state["elements"], primary_rows, state["secondary_rows"], state["params"],
+    )
+
+
+def _merge(partials):
+    """Une los encuentros y suma los conteos de cada shard."""
+    encounters = tuple(np.concatenate(parts) for parts in zip(*(p[0] for p in partials)))
+    counts = {}
+    for _, partial_counts in partials:
+        for key, value in partial_counts.items():
+            counts[key] = counts.get(key, 0) + value
+    return encounters, counts
+
+
+def run_sharded_scan(
+    ephemeris, start_time, interval_minutes, tle_pairs, elements, primary_rows, secondary_rows, params, workers=None
+):
+    """
+    Reparte las primarias en shards sobre un ProcessPoolExecutor. Cada proceso se adjunta sin copia a las
+    efemérides compartidas (SharedEphemeris) y recibe una sola vez los TLEs y elementos (no objetos ORM);
+    devuelve encuentros parciales que se unen aquí. Con un solo proceso se ejecuta en línea.
+    """
+    workers = workers or SCAN_WORKERS
+    primary_rows = np.asarray(primary_rows, dtype=np.intp)
+    n_shards = min(len(primary_rows), workers * SHARDS_PER_WORKER)
+
+    if workers <= 1 or n_shards <= 1:
+        satrecs = build_satrecs(tle_pairs)
+        return screen_primary_rows(
+            ephemeris.array, start_time, interval_minutes, satrecs, elements, primary_rows, secondary_rows, params
+        )
+
+    shards = np.array_split(primary_rows, n_shards)
+
+    print(
+        f"🧵 Collision scan: {n_shards} shards over {workers} worker processes "
+        f"(shared ephemeris {ephemeris.nbytes / 1e6:.1f} MB, {ephemeris.dtype})."
+    )
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(ephemeris.handle, start_time, interval_minutes, tle_pairs, elements, secondary_rows, params),
+    ) as pool:
+        partials = list(pool.map(_scan_shard, shards))
+    return _merge(partials)
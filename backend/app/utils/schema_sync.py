@@ -0,0 +1,24 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateIndex
+
+
+def sync_schema(engine, metadata):
+    """
+    create_all solo crea las tablas que no existen. Como el proyecto no usa migraciones, además se
+    añaden a las tablas existentes las columnas nullable y los índices nuevos del modelo.
+    """
+    metadata.create_all(bind=engine)
+    inspector = inspect(engine)
+    quote = engine.dialect.identifier_preparer.quote
+    with engine.begin() as conn:
+        for table in metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable or column.primary_key:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f"ALTER TABLE {quote(table.name)} ADD COLUMN {quote(column.name)} {column_type}"))
+                print(f"🔧 Added column {table.name}.{column.name}")
+            # IF NOT EXISTS en lugar de checkfirst: la reflexión no ve los índices sobre expresiones
+            for index in table.indexes:
+                conn.execute(CreateIndex(index, if_not_exists=True))
@@ -0,0 +1,86 @@
+import numpy as np
+
+# Velocidad relativa máxima esperada entre dos objetos en órbita terrestre (km/s)
+MAX_RELATIVE_SPEED_KM_S = 15.5
+
+# Desplazamientos hacia las 27 celdas vecinas (incluida la propia)
+_NEIGHBOR_OFFSETS = np.array(
+    [(dx, dy, dz) for dx in (-1, 0, 1) for dy in (-1, 0, 1) for dz in (-1, 0, 1)], dtype=np.int64
+)
+_AXIS_BITS = 21
+_AXIS_BIAS = 1 << (_AXIS_BITS - 1)
+
+
+def default_screening_km(threshold_km, interval_minutes, max_relative_speed_km_s=MAX_RELATIVE_SPEED_KM_S):
+    """
+    Radio del volumen de cribado: el umbral más lo que pueden acercarse dos objetos
+    entre una muestra y el TCA real (medio intervalo a la velocidad relativa máxima).
+    """
+    return threshold_km + max_relative_speed_km_s * interval_minutes * 60 / 2
+
+
+def _cell_keys(cells):
+    """Empaqueta coordenadas enteras de celda (n, 3) en una clave int64 por celda."""
+    biased = cells + _AXIS_BIAS
+    return (biased[:, 0] << (2 * _AXIS_BITS)) | (biased[:, 1] << _AXIS_BITS) | biased[:, 2]
+
+
+def pairs_within(pos_a, pos_b, radius_km):
+    """
+    Devuelve los índices locales (i, j) de los pares con |pos_a[i] - pos_b[j]| < radius_km
+    usando una rejilla uniforme de celda radius_km sobre pos_b. Las posiciones NaN se ignoran.
+    """
+    valid_a = np.flatnonzero(np.isfinite(pos_a).all(axis=1))
+    valid_b = np.flatnonzero(np.isfinite(pos_b).all(axis=1))
+    empty = np.empty(0, dtype=np.intp)
+    if not len(valid_a) or not len(valid_b):
+        return empty, empty
+
+    cells_a = np.floor(pos_a[valid_a] / radius_km).astype(np.int64)
+    keys_b = _cell_keys(np.floor(pos_b[valid_b] / radius_km).astype(np.int64))
+    order = np.argsort(keys_b, kind="stable")
+    sorted_keys = keys_b[order]
+
+    found_a, found_b = [], []
+    for offset in _NEIGHBOR_OFFSETS:
+        query = _cell_keys(cells_a + offset)
+        lo = np.searchsorted(sorted_keys, query, side="left")
+        counts = np.searchsorted(sorted_keys, query, side="right") - lo
+        total = counts.sum()
+        if not total:
+            continue
+        # Expande cada rango [lo, lo + count) en índices individuales
+        local_a = np.repeat(np.arange(len(query)), counts)
+        within = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        found_a.append(valid_a[local_a])
+        found_b.append(valid_b[order[lo[local_a] + within]])
+
+    if not found_a:
+        return empty, empty
+    idx_a = np.concatenate(found_a)
+    idx_b = np.concatenate(found_b)
+    diff = pos_a[idx_a] - pos_b[idx_b]
+    close = np.einsum("nk,nk->n", diff, diff) < radius_km**2
+    return idx_a[close], idx_b[close]
+
+
+def screen_candidate_pairs(positions, primary_rows, secondary_rows, screening_km):
+    """
+    Fase amplia del escaneo: en cada paso temporal agrupa las posiciones en la rejilla y
+    devuelve los pares únicos (fila_primaria, fila_secundaria) que entran en el volumen de cribado.
+    """
+    primary_rows = np.asarray(primary_rows, dtype=np.intp)
+    secondary_rows = np.asarray(secondary_rows, dtype=np.intp)
+    pair_codes = []
+    for step in range(positions.shape[1]):
+        idx_a, idx_b = pairs_within(
+            positions[primary_rows, step], positions[secondary_rows, step], screening_km
+        )
+        if len(idx_a):
+            pair_codes.append(np.unique(idx_a * len(secondary_rows) + idx_b))
+
+    if not pair_codes:
+        empty = np.empty(0, dtype=np.intp)
+        return empty, empty
+    codes = np.unique(np.concatenate(pair_codes))
+    return primary_rows[codes // len(secondary_rows)], secondary_rows[codes % len(secondary_rows)]
@@ -0,0 +1,40 @@
+import os
+import threading
+import time
+
+# Segundos máximos que se sirve una estadística sin recalcular. Las escrituras de este proceso invalidan
+# la caché al momento; el TTL cubre las que hacen otros procesos (CLI de ingesta, otros workers)
+STATS_CACHE_TTL_S = float(os.getenv("STATS_CACHE_TTL_S", "60"))
+
+
+class StatsCache:
+    """
+    Caché en memoria de estadísticas agregadas (/summary, /debris/stats). Se invalida entera tras cada
+    ingesta de TLEs, CDMs o alertas; un cálculo que empezó antes de una invalidación no se guarda.
+    """
+
+    def __init__(self, ttl_s=STATS_CACHE_TTL_S):
+        self.ttl_s = ttl_s
+        self._entries = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, compute):
+        with self._lock:
+            entry = self._entries.get(key)
+            generation = self._generation
+        if entry is not None and time.monotonic() - entry[0] < self.ttl_s:
+            return entry[1]
+        value = compute()
+        with self._lock:
+            if generation == self._generation:
+                self._entries[key] = (time.monotonic(), value)
+        return value
+
+    def invalidate(self, *_):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+
+stats_cache = StatsCache()
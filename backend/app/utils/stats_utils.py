@@ -1,39 +1,48 @@
-def calculate_debris_stats(debris_list):
+import numpy as np
+
+# Orígenes de debris considerados de alta prioridad (eventos COSMOS y FENGYUN)
+HIGH_PRIORITY_ORIGINS = ("cosmos_1408", "fengyun_1c", "cosmos_2251")
+
+def calculate_debris_stats(by_origin):
     """
-    Calcula estadísticas de debris por origen y prioridad a partir de una lista de objetos debris.
+    Calcula estadísticas de debris por origen y prioridad a partir de los conteos (origen, total).
     """
-    total_debris = len(debris_list)
     origins = {}
-    high_priority = 0
-    for d in debris_list:
-        name = (d.name or "").upper()
-        if "COSMOS-1408" in name:
-            origins["cosmos_1408"] = origins.get("cosmos_1408", 0) + 1
-        elif "FENGYUN-1C" in name:
-            origins["fengyun_1c"] = origins.get("fengyun_1c", 0) + 1
-        elif "IRIDIUM-33" in name:
-            origins["iridium_33"] = origins.get("iridium_33", 0) + 1
-        elif "COSMOS-2251" in name:
-            origins["cosmos_2251"] = origins.get("cosmos_2251", 0) + 1
-        else:
-            origins["other"] = origins.get("other", 0) + 1
-        if "COSMOS" in name or "FENGYUN" in name:
-            high_priority += 1
+    for origin, count in by_origin:
+        origins[origin or "other"] = origins.get(origin or "other", 0) + count
     return {
-        "total_debris": total_debris,
+        "total_debris": sum(origins.values()),
         "by_origin": origins,
-        "high_priority": high_priority
+        "high_priority": sum(origins.get(origin, 0) for origin in HIGH_PRIORITY_ORIGINS)
     }
 
-def calculate_satellite_stats(by_type, total):
+def calculate_altitude_bands(altitudes_km):
     """
-    Calcula estadísticas de satélites por tipo de objeto.
+    Cuenta objetos por régimen orbital a partir de su altitud actual (km).
+    Los objetos que no se pudieron propagar (NaN, p. ej. decaídos) se cuentan como "unavailable".
     """
-    stats = {t or "UNKNOWN": c for t, c in by_type}
+    altitudes_km = np.asarray(altitudes_km, dtype=float)
+    valid = altitudes_km[~np.isnan(altitudes_km)]
     return {
+        "LEO": int((valid < 2000).sum()),
+        "MEO": int(((valid >= 2000) & (valid < 35586)).sum()),
+        "GEO": int(((valid >= 35586) & (valid <= 35986)).sum()),
+        "HEO": int((valid > 35986).sum()),
+        "unavailable": int(len(altitudes_km) - len(valid)),
+    }
+
+def calculate_satellite_stats(by_type, total, altitudes_km=None):
+    """
+    Calcula estadísticas de satélites por tipo de objeto (y por régimen orbital si se pasan altitudes).
+    """
+    stats = {t or "UNKNOWN": c for t, c in by_type}
+    result = {
         "total": total,
         "by_type": stats
     }
+    if altitudes_km is not None:
+        result["by_altitude_band"] = calculate_altitude_bands(altitudes_km)
+    return result
 
 def build_system_summary(total_satellites, total_debris, total_cdm, last_tle_fetch_time, total_alerts):
     """
@@ -46,5 +55,4 @@ def build_system_summary(total_satellites, total_debris, total_cdm, last_tle_fet
         "last_tle_fetch_time": last_tle_fetch_time,
         "collision_alerts": total_alerts
     }
-    print("System Summary:", summary)  # Debugging line to check the summary structure
     return summary
@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from app.catalog_propagator import build_satrecs, propagate_catalog
+from app.collision_detector import build_time_grid, find_encounters
+
+# Par con un único acercamiento (~5.7 km) hacia las 17:27:36 UTC del 2025-06-17
+TLE_PAIR = [
+    (
+        "1 10062U 98067A   25168.50000000  .00016717  00000-0  10270-3 0  9005",
+        "2 10062  10.4083  71.0456 0000118  69.9862 313.1523 14.79372715 12345",
+    ),
+    (
+        "1 12379U 98067A   25168.50000000  .00016717  00000-0  10270-3 0  9005",
+        "2 12379  42.9260 224.7200 0000068  69.9862 160.6168 14.82028719 12345",
+    ),
+]
+INTERVAL_MINUTES = 10
+DURATION_HOURS = 2
+# Por debajo del acercamiento anterior del par (~11.5 km a las 16:39)
+THRESHOLD_KM = 8
+
+
+def _closest(times):
+    r, _, _ = propagate_catalog(TLE_PAIR, times)
+    dist = np.linalg.norm(r[0] - r[1], axis=1)
+    k = int(np.argmin(dist))
+    return times[k], float(dist[k])
+
+
+def _reference_tca():
+    """TCA y distancia por fuerza bruta: cada segundo alrededor del acercamiento y cada milisegundo después."""
+    start = datetime(2025, 6, 17, 17, 20, tzinfo=timezone.utc)
+    coarse, _ = _closest([start + timedelta(seconds=s) for s in range(900)])
+    return _closest([coarse + timedelta(milliseconds=ms) for ms in range(-1000, 1001)])
+
+
+def _screen(start_time):
+    times, _ = build_time_grid(start_time, DURATION_HOURS, INTERVAL_MINUTES)
+    positions, _, _ = propagate_catalog(TLE_PAIR, times)
+    _, _, tca_minutes, distances, _ = find_encounters(
+        positions, times[0], INTERVAL_MINUTES, build_satrecs(TLE_PAIR), [0], [1], threshold_km=THRESHOLD_KM
+    )
+    return [(times[0] + timedelta(minutes=float(m)), float(d)) for m, d in zip(tca_minutes, distances)]
+
+
+def _assert_found(encounters, tca, distance):
+    assert len(encounters) == 1
+    found_tca, found_distance = encounters[0]
+    assert abs((found_tca - tca).total_seconds()) < 1.0
+    assert abs(found_distance - distance) < 0.1
+
+
+def test_tca_inside_first_interval():
+    tca, distance = _reference_tca()
+    _assert_found(_screen(tca - timedelta(minutes=1.2)), tca, distance)
+
+
+def test_tca_inside_last_interval():
+    tca, distance = _reference_tca()
+    _assert_found(_screen(tca - timedelta(minutes=DURATION_HOURS * 60 - 1.5)), tca, distance)
@@ -14,12 +14,17 @@ import type {
   SummarySchema,
   SatelliteStatsSchema,
   ApiResponse,
+  PageResponse,
   CollisionAlertSchema,
   SatelliteSchema,
 } from "../types/api"
 import { OrbitVisualization } from "../components/orbit-visualization"
 
+// Alertas próximas que se piden por página (ordenadas por TCA desde ahora)
+const ALERTS_PAGE_SIZE = 100
+
 export default function Dashboard() {
+  const [alertsSince] = useState(() => new Date().toISOString())
   const [scanLoading, setScanLoading] = useState(false)
   const [scanMessage, setScanMessage] = useState<string>("")
 
@@ -34,7 +39,9 @@ export default function Dashboard() {
     data: collisionAlerts,
     loading: alertsLoading,
     refetch: refetchAlerts,
-  } = useApi<ApiResponse<CollisionAlertSchema[]>>("/api/collision-alerts")
+  } = useApi<PageResponse<CollisionAlertSchema>>(
+    `/api/collision-alerts?order_by=tca&tca_from=${encodeURIComponent(alertsSince)}&limit=${ALERTS_PAGE_SIZE}`,
+  )
   const {
     data: satellites,
     loading: satellitesLoading,
@@ -114,7 +121,11 @@ export default function Dashboard() {
 
           <TabsContent value="overview" className="space-y-4">
             <div className="grid lg:grid-cols-2 gap-6">
-              <CollisionAlerts alerts={collisionAlerts?.data || []} loading={alertsLoading} />
+              <CollisionAlerts
+                alerts={collisionAlerts?.data || []}
+                hasMore={Boolean(collisionAlerts?.next_cursor)}
+                loading={alertsLoading}
+              />
               <SatelliteStats stats={satelliteStats} loading={statsLoading} />
             </div>
 
@@ -142,7 +153,11 @@ export default function Dashboard() {
 
           <TabsContent value="alerts">
             <div className="space-y-4">
-              <CollisionAlerts alerts={collisionAlerts?.data || []} loading={alertsLoading} />
+              <CollisionAlerts
+                alerts={collisionAlerts?.data || []}
+                hasMore={Boolean(collisionAlerts?.next_cursor)}
+                loading={alertsLoading}
+              />
               {/* Additional alert details can go here */}
             </div>
           </TabsContent>
@@ -5,10 +5,12 @@ import type { CollisionAlertSchema } from "../types/api"
 
 interface CollisionAlertsProps {
   alerts: CollisionAlertSchema[]
+  // Hay más alertas que las de esta página
+  hasMore?: boolean
   loading: boolean
 }
 
-export function CollisionAlerts({ alerts, loading }: CollisionAlertsProps) {
+export function CollisionAlerts({ alerts, hasMore = false, loading }: CollisionAlertsProps) {
   if (loading) {
     return (
       <Card>
@@ -47,7 +49,7 @@ export function CollisionAlerts({ alerts, loading }: CollisionAlertsProps) {
       <CardHeader>
         <CardTitle className="flex items-center gap-2">
           <AlertTriangle className="h-5 w-5 text-red-500" />
-          Critical Collision Alerts ({alerts.length})
+          Critical Collision Alerts ({alerts.length}{hasMore ? "+" : ""})
         </CardTitle>
       </CardHeader>
       <CardContent>
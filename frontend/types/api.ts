@@ -60,3 +60,11 @@ export interface ApiResponse<T> {
   data: T
   count?: number
 }
+
+// Respuesta paginada por cursor (count = filas de esta página; next_cursor = null si no hay más)
+export interface PageResponse<T> {
+  status: string
+  data: T[]
+  count: number
+  next_cursor: string | null
+}